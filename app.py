@@ -3,14 +3,17 @@ Licensing Roadmap Flask Application
 A plumber-focused state licensing tracking system
 """
 
-from flask import Flask, render_template, jsonify, abort, request, redirect, session, send_file
+from flask import Flask, render_template, jsonify, abort, request, redirect, session, send_file, g, Response
+import io
 import json
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 from models import (
-    SessionLocal, RSLicenseHolder, RSLicense, RSLicenseCost,
-    RSLicenseBudget, RSCompanyCoverage, RSBioData
+    SessionLocal, RSLicense, RSLicenseCost,
+    RSLicenseBudget, RSBioData,
+    begin_request_session, end_request_session, pool_stats
 )
 from db_write_functions import (
     save_license_holder_data, add_license_to_db, update_license_in_db,
@@ -20,16 +23,30 @@ from db_write_functions import (
     add_work_history, add_reference, add_job_project,
     add_company_coverage_state, move_company_coverage_state, 
     remove_company_coverage_state, update_state_revenue,
-    update_bio_personal_info, bulk_import_licenses
+    update_bio_personal_info
 )
+from db_read_functions import (
+    load_license_holder_data, load_all_holders, holder_exists,
+    licenses_expiring_between, count_licenses_expiring_between, expiring_counts_by_holder
+)
+from team_aggregates import team_summary, holder_rollup, state_rollup, team_data_version, EXPIRING_SOON_DAYS
+from cost_aggregates import cost_rollups
+from csv_import import read_license_rows, import_license_rows, import_multi_holder_rows
+from jobs import submit_job, get_job, job_status
+from holder_cache import holder_cache
+from report_cache import report_cache, cost_report_stamp
+from holder_packets import stream_packets_zip
+from state_details import state_details
+from reference_data import reference_data, load_reference_json
+from markdown_cache import markdown_cache, MARKDOWN_WARMUP
+from search_index import search_index
+from holder_identity import verified_holder_id
 from sqlalchemy import func
 from decimal import Decimal
 
 # Load environment variables
 load_dotenv()
 
-import markdown
-
 # Simple password authentication
 ACCESS_CODE = "TeamLicense2024"  # Change this to your team's password
 
@@ -105,7 +122,7 @@ def login():
             
             # For license holders, check if account is locked
             if user['user_type'] == 'license_holder':
-                holder = load_license_holder_data(user['user_id'])
+                holder = get_request_holder(user['user_id'])
                 if holder and holder.get('account_status') == 'locked':
                     return render_template('login.html', error='Account locked. Contact your manager.')
             
@@ -128,6 +145,18 @@ def logout():
 
 
 
+@app.before_request
+def open_request_session():
+    """Share one database session (and pooled connection) across every helper in this request"""
+    g.db_session_token = begin_request_session()
+
+@app.teardown_request
+def close_request_session(exc=None):
+    """Release the request's database session back to the pool (rolled back if the request failed)"""
+    token = g.pop('db_session_token', None)
+    if token is not None:
+        end_request_session(token, failed=exc is not None)
+
 @app.before_request
 def require_login():
     """Require login for all routes except /login and landing page"""
@@ -146,8 +175,6 @@ def require_login():
 @app.context_processor
 def inject_current_account():
     """Make current account available to all templates"""
-    import os
-    
     # Get account from session or URL parameter
     account = get_allowed_account()
     
@@ -159,33 +186,18 @@ def inject_current_account():
             'role': 'Leadership View'
         }
         
-        # Calculate team stats for brag bar
-        team_total_licenses = 0
-        team_total_states = set()
-        team_total_holders = 0
-        
-        holders_dir = 'data/license_holders'
-        if os.path.exists(holders_dir):
-            for filename in os.listdir(holders_dir):
-                if filename.endswith('.json') and filename != 'director.json':
-                    filepath = os.path.join(holders_dir, filename)
-                    with open(filepath, 'r') as f:
-                        holder = json.load(f)
-                        team_total_licenses += len(holder.get('licenses', []))
-                        for lic in holder.get('licenses', []):
-                            if lic.get('jurisdiction_abbr'):
-                                team_total_states.add(lic['jurisdiction_abbr'])
-                        team_total_holders += 1
+        # Team stats for brag bar
+        summary = get_request_team_summary()
         
         return dict(
             current_account=account, 
             holder=current_holder,
-            team_total_licenses=team_total_licenses,
-            team_total_states=len(team_total_states),
-            team_total_holders=team_total_holders
+            team_total_licenses=summary['total_licenses'],
+            team_total_states=summary['total_states'],
+            team_total_holders=summary['total_holders']
         )
     else:
-        current_holder = load_license_holder_data(account)
+        current_holder = get_request_holder(account)
         if not current_holder:
             current_holder = {'user_id': 'bhambrick', 'name': 'User', 'role': 'License Holder', 'licenses': []}
     
@@ -195,194 +207,75 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-i
 
 # Configuration
 DUE_SOON_DAYS = 90  # Days before expiration to show "due soon"
+MULTI_HOLDER_IMPORT = '__holder_column__'  # license_holder value that routes CSV rows by their Holder column
+PDF_SPOOL_MAX_MEMORY = 4 * 1024 * 1024  # Bytes of a generated PDF kept in memory before spilling to disk
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes per chunk when streaming generated files
 DATA_DIR = os.path.join(app.root_path, 'data')
 STATES_DIR = os.path.join(DATA_DIR, 'states')
+LICENSING_DATA_FILE = os.path.join(DATA_DIR, 'licensing_roadmap.json')
 
 
-def load_licensing_data():
-    """Load the main licensing roadmap data from JSON"""
-    json_path = os.path.join(DATA_DIR, 'licensing_roadmap.json')
-    try:
-        with open(json_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {"states": {}}
+def get_request_holder(account):
+    """
+    Load a license holder at most once per request
 
+    The context processor and the view both need the current holder, so the
+    result is memoized on flask.g and shared between them.
+    """
+    memo = g.setdefault('holder_memo', {})
+    if account not in memo:
+        memo[account] = load_license_holder_data(account)
+    return memo[account]
 
-"""
-Database replacement functions for app.py
-These replace the JSON file reading functions
-"""
 
-def load_license_holder_data(user_id='bhambrick'):
-    """Load data for a specific license holder from database"""
-    db = SessionLocal()
-    try:
-        # Query by employee_id or pin
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == user_id) | (RSLicenseHolder.pin == user_id)
-        ).first()
-        
-        if not holder:
-            return None
-        
-        # Convert to dictionary format (same as old JSON structure)
-        holder_data = {
-            'user_id': holder.employee_id or holder.pin,
-            'name': holder.full_name,
-            'role': holder.role,
-            'total_licenses': holder.total_licenses,
-            'total_certificates': holder.total_certificates,
-            'next_target_state': holder.next_target_state,
-            'pin': holder.pin,
-            'licenses': []
-        }
-        
-        # Add licenses
-        for lic in holder.licenses:
-            license_dict = {
-                'license_id': lic.license_id,
-                'jurisdiction': lic.jurisdiction,
-                'jurisdiction_abbr': lic.jurisdiction_abbr,
-                'jurisdiction_type': lic.jurisdiction_type,
-                'license_type': lic.license_type,
-                'license_number': lic.license_number,
-                'status': lic.status,
-                'issued_on': lic.issued_on.isoformat() if lic.issued_on else None,
-                'expires_on': lic.expires_on.isoformat() if lic.expires_on else None,
-                'board_name': lic.board_name,
-                'board_phone': lic.board_phone,
-                'board_email': lic.board_email,
-                'board_url': lic.board_url,
-                'designated_role': lic.designated_role,
-                'recurring': {
-                    'renewal_period_years': lic.renewal_period_years,
-                    'renewal_fee': float(lic.renewal_fee) if lic.renewal_fee else 0
-                },
-                'actual_costs': [],
-                'estimated_costs': {},
-                'cost_totals': {
-                    'initial_estimated': 0,
-                    'actual_spent': 0,
-                    'variance': 0,
-                    'recurring_cost': 0
-                }
-            }
-            
-            # Add actual costs
-            for cost in lic.costs:
-                license_dict['actual_costs'].append({
-                    'date': cost.date.isoformat() if cost.date else None,
-                    'category': cost.category,
-                    'amount': float(cost.amount),
-                    'vendor': cost.vendor,
-                    'notes': cost.notes
-                })
-            
-            # Add budget (estimated costs)
-            if lic.budget:
-                budget = lic.budget
-                license_dict['estimated_costs'] = {
-                    'application_fee': float(budget.application_fee or 0),
-                    'test_fee': float(budget.test_fee or 0),
-                    'trade_book_fee': float(budget.trade_book_fee or 0),
-                    'business_law_book_fee': float(budget.business_law_book_fee or 0),
-                    'activation_fee': float(budget.activation_fee or 0),
-                    'prep_course_fee': float(budget.prep_course_fee or 0),
-                    'travel': float(budget.travel_estimate or 0),
-                    'shipping': float(budget.shipping_estimate or 0),
-                    'renewal_fee': float(budget.renewal_fee or 0),
-                    'continuing_ed_fee': float(budget.continuing_ed_fee or 0)
-                }
-                
-                # Calculate totals
-                initial_estimated = sum([
-                    float(budget.application_fee or 0),
-                    float(budget.test_fee or 0),
-                    float(budget.trade_book_fee or 0),
-                    float(budget.business_law_book_fee or 0),
-                    float(budget.activation_fee or 0),
-                    float(budget.prep_course_fee or 0),
-                    float(budget.travel_estimate or 0),
-                    float(budget.shipping_estimate or 0)
-                ])
-                
-                actual_spent = sum(float(c.amount) for c in lic.costs)
-                recurring_cost = float(budget.renewal_fee or 0) + float(budget.continuing_ed_fee or 0)
-                
-                license_dict['cost_totals'] = {
-                    'initial_estimated': initial_estimated,
-                    'actual_spent': actual_spent,
-                    'variance': actual_spent - initial_estimated,
-                    'recurring_cost': recurring_cost
-                }
-                
-                license_dict['planning'] = {
-                    'est_study_hours': 0,
-                    'test_duration_hours': 0
-                }
-            
-            holder_data['licenses'].append(license_dict)
-        
-        # Add bio data if exists
-        if holder.bio_data:
-            bio = holder.bio_data
-            holder_data['bio'] = {
-                'personal_info': bio.personal_info,
-                'addresses': bio.addresses,
-                'work_history': bio.work_history,
-                'plumbing_experience': bio.plumbing_experience,
-                'job_projects': bio.job_projects,
-                'education': bio.education,
-                'references': bio.professional_references,
-                'background': bio.background,
-                'military': bio.military
-            }
-        
-        return holder_data
-        
-    finally:
-        db.close()
+def get_request_team_summary():
+    """Company-wide totals (team_aggregates.team_summary) at most once per request"""
+    if 'team_summary' not in g:
+        g.team_summary = team_summary()
+    return g.team_summary
 
 
-def load_company_data():
-    """Load company-wide coverage data from database"""
-    db = SessionLocal()
-    try:
-        coverage_records = db.query(RSCompanyCoverage).all()
-        
-        company_data = {
-            'company_name': 'Repipe Specialists',
-            'covered_states': [],
-            'in_progress_states': [],
-            'target_states': []
-        }
-        
-        for record in coverage_records:
-            if record.status == 'licensed':
-                company_data['covered_states'].append(record.state_code)
-            elif record.status == 'in_progress':
-                company_data['in_progress_states'].append(record.state_code)
-            elif record.status == 'target':
-                company_data['target_states'].append(record.state_code)
-        
-        company_data['total_states_covered'] = len(company_data['covered_states'])
-        company_data['total_states_in_progress'] = len(company_data['in_progress_states'])
-        
-        return company_data
-        
-    finally:
-        db.close()
+def get_request_team_holders():
+    """Team roster with per-holder counts (team_aggregates.holder_rollup) at most once per request"""
+    if 'team_holders' not in g:
+        g.team_holders = holder_rollup()
+    return g.team_holders
+
+
+def get_request_state_rollup():
+    """Per-state coverage (team_aggregates.state_rollup) at most once per request"""
+    if 'state_rollup' not in g:
+        g.state_rollup = state_rollup()
+    return g.state_rollup
+
+
+def load_licensing_data():
+    """Load the main licensing roadmap data from JSON"""
+    return load_reference_json(LICENSING_DATA_FILE, {"states": {}})
+
+
+def conditional_json(etag, build):
+    """
+    JSON response carrying a strong ETag
+
+    If the client's If-None-Match already has etag (weak comparison, as
+    RFC 9110 requires for If-None-Match), answers 304 without
+    calling build(); otherwise returns jsonify(build()). Cache-Control
+    makes browsers revalidate on every poll instead of reusing a stale copy.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 def load_training_roadmap(roadmap_id='master_plumber_southwest'):
     """Load a training roadmap"""
     json_path = os.path.join('data', 'training_roadmaps', f'{roadmap_id}.json')
-    try:
-        with open(json_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return None
+    return load_reference_json(json_path)
 
 
 
@@ -400,8 +293,11 @@ def calculate_license_totals(license):
     initial_cost = sum(v for v in estimated.values() if v is not None)
     
     # Actual cost = sum of all actual cost line items
-    actual_costs = license.get('actual_costs', [])
-    actual_total = sum(item.get('amount', 0) or 0 for item in actual_costs)
+    # (licenses loaded without cost lines carry a pre-summed total instead)
+    if 'actual_costs' in license:
+        actual_total = sum(item.get('amount', 0) or 0 for item in license['actual_costs'])
+    else:
+        actual_total = license.get('cost_totals', {}).get('actual_spent', 0)
     
     # Recurring cost = renewal + CE per period (handle None values)
     recurring = license.get('recurring', {})
@@ -418,62 +314,98 @@ def calculate_license_totals(license):
 
 def enhance_license_data(license):
     """Add calculated fields to license data"""
-    enhanced = license.copy()
+    return enhance_licenses([license])[0]
+
+
+def enhance_licenses(licenses, today=None):
+    """
+    Add calculated fields to a batch of licenses
     
-    # Calculate status class based on expiration
-    enhanced['status_class'] = get_state_status_class(license)
-    enhanced['badge_text'] = get_state_badge_text(license)
-    enhanced['days_remaining'] = calculate_days_remaining(license.get('expires_on'))
+    Reads the clock once and parses each distinct expires_on string once
+    (renewals tend to share dates), instead of three fromisoformat calls
+    per license through the single-license helpers.
+    """
+    today = today or date.today()
+    days_by_date = {}
+    enhanced_licenses = []
     
-    # Calculate cost totals
-    totals = calculate_license_totals(license)
-    enhanced['cost_totals'] = totals
+    for license in licenses:
+        expires_on = license.get('expires_on')
+        if expires_on not in days_by_date:
+            days_by_date[expires_on] = _days_until(expires_on, today)
+        days_remaining = days_by_date[expires_on]
+        
+        enhanced = license.copy()
+        status = license.get('status', 'not_licensed')
+        
+        # Calculate status class based on expiration
+        enhanced['status_class'] = _status_class(status, days_remaining)
+        enhanced['badge_text'] = _badge_text(status, days_remaining)
+        enhanced['days_remaining'] = days_remaining
+        
+        # Calculate cost totals
+        enhanced['cost_totals'] = calculate_license_totals(license)
+        
+        enhanced_licenses.append(enhanced)
     
-    return enhanced
+    return enhanced_licenses
 
 
-def calculate_days_remaining(expires_on):
-    """Calculate days remaining until expiration"""
+def enhance_team_licenses(holders):
+    """enhance_licenses() across every holder's licenses, tagging each with holder_name"""
+    owners = []
+    licenses = []
+    for holder in holders:
+        for license in holder.get('licenses', []):
+            owners.append(holder['name'])
+            licenses.append(license)
+    
+    enhanced_licenses = enhance_licenses(licenses)
+    for enhanced, holder_name in zip(enhanced_licenses, owners):
+        enhanced['holder_name'] = holder_name
+    
+    return enhanced_licenses
+
+
+def _days_until(expires_on, today):
+    """
+    Whole days from today until an ISO date, or None
+    
+    0 on the expiry date itself, negative once past: the same rule as
+    licenses_expiring_between, which counts from date.today() in SQL.
+    """
     if not expires_on:
         return None
     
     try:
-        exp_date = datetime.fromisoformat(expires_on)
-        today = datetime.now()
-        delta = exp_date - today
-        return delta.days
+        return (datetime.fromisoformat(expires_on).date() - today).days
     except (ValueError, TypeError):
         return None
 
 
-def get_state_status_class(state_data):
-    """Determine CSS class for state based on status and expiration"""
-    status = state_data.get('status', 'not_licensed')
-    expires_on = state_data.get('expires_on')
-    
-    if status == 'licensed' and expires_on:
-        days_remaining = calculate_days_remaining(expires_on)
-        if days_remaining is not None:
-            if days_remaining < 0:
-                return 'overdue'
-            elif days_remaining <= DUE_SOON_DAYS:
-                return 'due-soon'
+def calculate_days_remaining(expires_on):
+    """Calculate days remaining until expiration"""
+    return _days_until(expires_on, date.today())
+
+
+def _status_class(status, days_remaining):
+    """CSS class for a status given days until expiration"""
+    if status == 'licensed' and days_remaining is not None:
+        if days_remaining < 0:
+            return 'overdue'
+        elif days_remaining <= DUE_SOON_DAYS:
+            return 'due-soon'
     
     return status
 
 
-def get_state_badge_text(state_data):
-    """Get human-readable badge text for state status"""
-    status = state_data.get('status', 'not_licensed')
-    expires_on = state_data.get('expires_on')
-    
-    if status == 'licensed' and expires_on:
-        days_remaining = calculate_days_remaining(expires_on)
-        if days_remaining is not None:
-            if days_remaining < 0:
-                return 'Overdue'
-            elif days_remaining <= DUE_SOON_DAYS:
-                return 'Renewal Due Soon'
+def _badge_text(status, days_remaining):
+    """Badge text for a status given days until expiration"""
+    if status == 'licensed' and days_remaining is not None:
+        if days_remaining < 0:
+            return 'Overdue'
+        elif days_remaining <= DUE_SOON_DAYS:
+            return 'Renewal Due Soon'
     
     status_map = {
         'licensed': 'Licensed ✅',
@@ -484,17 +416,26 @@ def get_state_badge_text(state_data):
     return status_map.get(status, 'Not Licensed')
 
 
+def get_state_status_class(state_data):
+    """Determine CSS class for state based on status and expiration"""
+    return _status_class(state_data.get('status', 'not_licensed'),
+                         calculate_days_remaining(state_data.get('expires_on')))
+
+
+def get_state_badge_text(state_data):
+    """Get human-readable badge text for state status"""
+    return _badge_text(state_data.get('status', 'not_licensed'),
+                       calculate_days_remaining(state_data.get('expires_on')))
+
+
 def load_state_detail(state_abbr):
-    """Load state detail content from markdown file"""
+    """Load state detail content from markdown file (rendered once per content change)"""
     md_path = os.path.join(STATES_DIR, f'{state_abbr.lower()}.md')
-    
-    try:
-        with open(md_path, 'r') as f:
-            content = f.read()
-            html_content = markdown.markdown(content, extensions=['extra', 'nl2br'])
-            return html_content
-    except FileNotFoundError:
-        return None
+    return markdown_cache.render_file(md_path)
+
+
+if MARKDOWN_WARMUP:
+    markdown_cache.warm(STATES_DIR)
 
 
 
@@ -518,84 +459,37 @@ def home():
     
     # Handle director view
     if account == 'director':
-        import glob
-        all_licenses = []
-        all_holders = []
-        
-        holder_files = glob.glob('data/license_holders/*.json')
-        for holder_file in holder_files:
-            with open(holder_file, 'r') as f:
-                holder = json.load(f)
-                all_holders.append(holder)
-                
-                for license in holder.get('licenses', []):
-                    enhanced = enhance_license_data(license)
-                    enhanced['holder_name'] = holder['name']
-                    all_licenses.append(enhanced)
+        summary = get_request_team_summary()
+        all_holders = get_request_team_holders()
+        states = get_request_state_rollup()
         
         # Load company coverage data
-        import os
-        coverage = {}
-        coverage_file = 'data/company/coverage.json'
-        if os.path.exists(coverage_file):
-            with open(coverage_file, 'r') as f:
-                coverage = json.load(f)
+        coverage = load_reference_json('data/company/coverage.json', {})
         
         # Calculate stats for all license holders
-        total_licenses = sum(h.get('total_licenses', 0) for h in all_holders)
-        expiring_soon = 0
-        annual_cost = 0
-        active_states_detail = {}
-        
-        # Build detailed state info
-        for license in all_licenses:
-            abbr = license.get('jurisdiction_abbr')
-            if abbr:
-                if abbr not in active_states_detail:
-                    active_states_detail[abbr] = {'holders': []}
-                
-                # Store holder info (name + user_id) to make links work
-                holder_name = license.get('holder_name')
-                holder_user_id = next((h.get('user_id') for h in all_holders if h.get('name') == holder_name), None)
-                
-                holder_info = {
-                    'name': holder_name,
-                    'user_id': holder_user_id
-                }
-                
-                # Only add if not already in list
-                if not any(h['name'] == holder_name for h in active_states_detail[abbr]['holders']):
-                    active_states_detail[abbr]['holders'].append(holder_info)
-            
-            # Count expiring
-            days = license.get('days_remaining')
-            if days and days <= 60:
-                expiring_soon += 1
-            
-            # Sum costs
-            annual_cost += license.get('cost_totals', {}).get('recurring_cost', 0) / 2  # Assuming 2-year periods
+        total_licenses = summary['holder_total_licenses']
+        expiring_soon = sum(h['expiring_count'] for h in all_holders)
+        annual_cost = summary['annual_recurring_cost']
+        
+        # Build detailed state info (name + user_id to make links work)
+        active_states_detail = {
+            abbr: {'holders': [{'name': h['name'], 'user_id': h['user_id']} for h in state['holders']]}
+            for abbr, state in states.items()
+        }
         
         # Prepare team member cards with stats
-        team_members = []
-        for holder in all_holders:
-            holder_licenses = holder.get('licenses', [])
-            states_count = len(set(lic.get('jurisdiction_abbr') for lic in holder_licenses if lic.get('jurisdiction_abbr')))
-            expiring_count = sum(1 for lic in holder_licenses 
-                               if lic.get('expires_on') and calculate_days_remaining(lic.get('expires_on')) 
-                               and calculate_days_remaining(lic.get('expires_on')) <= 60)
-            
-            team_members.append({
-                'user_id': holder.get('user_id'),
-                'name': holder.get('name'),
-                'role': holder.get('role', 'License Holder'),
-                'total_licenses': holder.get('total_licenses', 0),
-                'states_count': states_count,
-                'expiring_count': expiring_count
-            })
-        
-        # Build urgent items with holder names
+        team_members = [{
+            'user_id': holder['user_id'],
+            'name': holder['name'],
+            'role': holder['role'],
+            'total_licenses': holder['total_licenses'],
+            'states_count': holder['states_count'],
+            'expiring_count': holder['expiring_count']
+        } for holder in all_holders]
+        
+        # Build urgent items with holder names (overdue or expiring within 30 days, soonest first)
         urgent_items = []
-        for license in all_licenses:
+        for license in licenses_expiring_between(end=date.today() + timedelta(days=30)):
             days_remaining = license.get('days_remaining')
             if license.get('status') == 'overdue':
                 urgent_items.append({
@@ -631,7 +525,7 @@ def home():
                              urgent_items=urgent_items[:10])
     else:
         # Individual holder
-        holder_data = load_license_holder_data(account)
+        holder_data = get_request_holder(account)
         
         if not holder_data:
             return render_template('home.html', 
@@ -640,22 +534,14 @@ def home():
                                  urgent_items=[], 
                                  recent_licenses=[],
                                  cost_summary={'total_estimated': 0, 'total_spent': 0, 'annual_recurring': 0})
-        
-        enhanced_licenses = []
-        for license in holder_data.get('licenses', []):
-            enhanced = enhance_license_data(license)
-            enhanced_licenses.append(enhanced)
     
-    enhanced_licenses = []
+    enhanced_licenses = enhance_licenses(holder_data.get('licenses', []))
     total_estimated = 0
     total_actual = 0
     annual_recurring = 0
     urgent_items = []
     
-    for license in holder_data.get('licenses', []):
-        enhanced = enhance_license_data(license)
-        enhanced_licenses.append(enhanced)
-        
+    for enhanced in enhanced_licenses:
         total_estimated += enhanced['cost_totals']['initial_estimated']
         total_actual += enhanced['cost_totals']['actual_spent']
         
@@ -726,30 +612,26 @@ def licensing_roadmap():
         return render_director_view()
     
     # Load license holder data
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     
     if not holder_data:
         return "License holder not found", 404
     
     states = holder_data.get("states", {})
     
-    # Start with all 50 states (base data)
-    import os
-    base_states_path = 'data/base_data/all_states.json'
-    if os.path.exists(base_states_path):
-        with open(base_states_path, 'r') as f:
-            enhanced_states = json.load(f)
-            # Add default fields to each state
-            for abbr, state_data in enhanced_states.items():
-                state_data['state_abbr'] = abbr
-                state_data['status_class'] = 'not_licensed'
-                state_data['badge_text'] = 'Not Licensed'
-                state_data['days_remaining'] = None
-                state_data['board_name'] = f'{state_data["name"]} State Board'
-                state_data['board_url'] = '#'
-                state_data['summary'] = f'No license data available for {state_data["name"]} yet.'
-    else:
-        enhanced_states = {}
+    # Start with all 50 states (base data, copied since it's shared)
+    enhanced_states = {}
+    for abbr, base_state in load_reference_json('data/base_data/all_states.json', {}).items():
+        state_data = dict(base_state)
+        # Add default fields to each state
+        state_data['state_abbr'] = abbr
+        state_data['status_class'] = 'not_licensed'
+        state_data['badge_text'] = 'Not Licensed'
+        state_data['days_remaining'] = None
+        state_data['board_name'] = f'{state_data["name"]} State Board'
+        state_data['board_url'] = '#'
+        state_data['summary'] = f'No license data available for {state_data["name"]} yet.'
+        enhanced_states[abbr] = state_data
     
     # Overlay actual license data
     for license in holder_data.get('licenses', []):
@@ -798,66 +680,27 @@ def licensing_roadmap():
                          coverage_json=json.dumps({}))
 def render_director_view():
     """Render the director/leadership aggregated view with company coverage"""
-    import glob
-    import os
+    coverage = load_reference_json('data/company/coverage.json', {})
     
-    coverage = {}
-    coverage_file = 'data/company/coverage.json'
-    if os.path.exists(coverage_file):
-        with open(coverage_file, 'r') as f:
-            coverage = json.load(f)
-    
-    # Load all license holders
+    # Per-state coverage across all license holders
     all_states = {}
-    all_holders = []
-    
-    holder_files = glob.glob('data/license_holders/*.json')
-    
-    for holder_file in holder_files:
-        with open(holder_file, 'r') as f:
-            holder = json.load(f)
-            all_holders.append(holder)
-            
-            # Process each license
-            for license in holder.get('licenses', []):
-                abbr = license.get('jurisdiction_abbr')
-                if not abbr:
-                    continue
-                    
-                if abbr not in all_states:
-                    # Initialize with first holder's data
-                    all_states[abbr] = {
-                        'name': license['jurisdiction'],
-                        'status': license['status'],
-                        'holders': [],
-                        'holder_details': [],
-                        'board_name': license.get('board_name'),
-                        'board_url': license.get('board_url'),
-                        'expires_on': license.get('expires_on'),
-                        'company_status': 'not_active',  # Will be updated from coverage
-                        'revenue': 0,
-                        'license_type': license.get('license_type'),
-                        'state_abbr': abbr
-                    }
-                else:
-                    # Upgrade status if better coverage exists
-                    if license['status'] == 'licensed' and all_states[abbr]['status'] != 'licensed':
-                        all_states[abbr]['status'] = 'licensed'
-                    elif license['status'] == 'in_progress' and all_states[abbr]['status'] == 'not_licensed':
-                        all_states[abbr]['status'] = 'in_progress'
-                    
-                    # Track earliest expiration date
-                    if license.get('expires_on'):
-                        if not all_states[abbr].get('expires_on'):
-                            all_states[abbr]['expires_on'] = license['expires_on']
-                        else:
-                            # Keep the earliest expiration
-                            if license['expires_on'] < all_states[abbr]['expires_on']:
-                                all_states[abbr]['expires_on'] = license['expires_on']
-                
-                all_states[abbr]['holders'].append(holder['name'])
+    all_holders = get_request_team_holders()
+    
+    for abbr, state in get_request_state_rollup().items():
+        all_states[abbr] = {
+            'name': state['name'],
+            'status': state['status'],
+            'holders': [h['name'] for h in state['holders']],
+            'holder_details': [],
+            'board_name': state['board_name'],
+            'board_url': state['board_url'],
+            'expires_on': state['expires_on'],  # Earliest expiration
+            'company_status': 'not_active',  # Will be updated from coverage
+            'revenue': 0,
+            'license_type': state['license_type'],
+            'state_abbr': abbr
+        }
     
-
     # Overlay company coverage status
     for abbr in all_states:
         if abbr in coverage.get('covered_states', []):
@@ -875,32 +718,29 @@ def render_director_view():
             all_states[abbr]['revenue'] = coverage['state_revenues'][abbr]
     
     # Add base state data for states not yet licensed
-    base_states_file = 'data/base_data/all_states.json'
-    if os.path.exists(base_states_file):
-        with open(base_states_file, 'r') as f:
-            base_states = json.load(f)
-            for abbr, state_data in base_states.items():
-                if abbr not in all_states:
-                    all_states[abbr] = {
-                        'name': state_data['name'],
-                        'state_abbr': abbr,
-                        'status': 'not_licensed',
-                        'status_class': 'not-licensed',
-                        'company_status': 'not_active',
-                        'holders': [],
-                        'holder_details': [],
-                        'summary': 'Not licensed'
-                    }
-                    # Check if it's in coverage
-                    if abbr in coverage.get('covered_states', []):
-                        all_states[abbr]['company_status'] = 'licensed'
-                        all_states[abbr]['status_class'] = 'company-licensed'
-                    elif abbr in coverage.get('in_progress_states', []):
-                        all_states[abbr]['company_status'] = 'in_progress'
-                        all_states[abbr]['status_class'] = 'company-in-progress'
-                    elif abbr in coverage.get('target_states', []):
-                        all_states[abbr]['company_status'] = 'target'
-                        all_states[abbr]['status_class'] = 'company-target'
+    base_states = load_reference_json('data/base_data/all_states.json', {})
+    for abbr, state_data in base_states.items():
+        if abbr not in all_states:
+            all_states[abbr] = {
+                'name': state_data['name'],
+                'state_abbr': abbr,
+                'status': 'not_licensed',
+                'status_class': 'not-licensed',
+                'company_status': 'not_active',
+                'holders': [],
+                'holder_details': [],
+                'summary': 'Not licensed'
+            }
+            # Check if it's in coverage
+            if abbr in coverage.get('covered_states', []):
+                all_states[abbr]['company_status'] = 'licensed'
+                all_states[abbr]['status_class'] = 'company-licensed'
+            elif abbr in coverage.get('in_progress_states', []):
+                all_states[abbr]['company_status'] = 'in_progress'
+                all_states[abbr]['status_class'] = 'company-in-progress'
+            elif abbr in coverage.get('target_states', []):
+                all_states[abbr]['company_status'] = 'target'
+                all_states[abbr]['status_class'] = 'company-target'
 
     # Enhance state data for director view
     enhanced_states = {}
@@ -960,19 +800,21 @@ def render_director_view():
 @app.route('/api/states')
 def api_states():
     """API endpoint for state data (for AJAX/JS usage)"""
-    data = load_licensing_data()
-    states = data.get('states', {})
+    data, version = reference_data.load_versioned(LICENSING_DATA_FILE, {"states": {}})
     
-    # Enhance state data
-    enhanced_states = {}
-    for abbr, state_data in states.items():
-        enhanced = state_data.copy()
-        enhanced['status_class'] = get_state_status_class(state_data)
-        enhanced['badge_text'] = get_state_badge_text(state_data)
-        enhanced['days_remaining'] = calculate_days_remaining(state_data.get('expires_on'))
-        enhanced_states[abbr] = enhanced
+    def build():
+        # Enhance state data
+        enhanced_states = {}
+        for abbr, state_data in data.get('states', {}).items():
+            enhanced = state_data.copy()
+            enhanced['status_class'] = get_state_status_class(state_data)
+            enhanced['badge_text'] = get_state_badge_text(state_data)
+            enhanced['days_remaining'] = calculate_days_remaining(state_data.get('expires_on'))
+            enhanced_states[abbr] = enhanced
+        return enhanced_states
     
-    return jsonify(enhanced_states)
+    # Status and days remaining depend on the date as well as the file
+    return conditional_json(f'states-{version}-{date.today().isoformat()}', build)
 
 
 @app.route('/admin/licensing/states')
@@ -1003,69 +845,51 @@ def admin_states_list():
 @app.route('/api/leadership-data')
 def leadership_data():
     """API endpoint for leadership dashboard data"""
-    # Load all license holders
-    import glob
-    
-    all_holders = []
+    return conditional_json(f'leadership-{team_data_version()}', build_leadership_data)
+
+
+def build_leadership_data():
+    """Payload for /api/leadership-data"""
+    summary = get_request_team_summary()
     state_coverage = {}
-    expiring_soon = []
     
-    holder_files = glob.glob('data/license_holders/*.json')
+    for state_abbr, state in get_request_state_rollup().items():
+        state_coverage[state_abbr] = {
+            'name': state['name'],
+            'licensed_count': sum(1 for h in state['holders'] if h['status'] == 'licensed'),
+            'in_progress_count': sum(1 for h in state['holders'] if h['status'] == 'in_progress'),
+            'holders': [h['name'] for h in state['holders']]
+        }
     
-    for holder_file in holder_files:
-        with open(holder_file, 'r') as f:
-            holder = json.load(f)
-            all_holders.append(holder)
-            
-            # Track coverage by state
-            for state_abbr, state_data in holder.get('states', {}).items():
-                if state_abbr not in state_coverage:
-                    state_coverage[state_abbr] = {
-                        'name': state_data['name'],
-                        'licensed_count': 0,
-                        'in_progress_count': 0,
-                        'holders': []
-                    }
-                
-                if state_data['status'] == 'licensed':
-                    state_coverage[state_abbr]['licensed_count'] += 1
-                elif state_data['status'] == 'in_progress':
-                    state_coverage[state_abbr]['in_progress_count'] += 1
-                
-                state_coverage[state_abbr]['holders'].append(holder['name'])
-                
-                # Track expiring licenses
-                if state_data.get('expires_on'):
-                    days_remaining = calculate_days_remaining(state_data['expires_on'])
-                    if days_remaining is not None and days_remaining <= 90:
-                        expiring_soon.append({
-                            'holder': holder['name'],
-                            'state': state_data['name'],
-                            'state_abbr': state_abbr,
-                            'days_remaining': days_remaining,
-                            'expires_on': state_data['expires_on']
-                        })
+    # Licenses expiring within 90 days (overdue included), already sorted by expiry
+    expiring_soon = [{
+        'holder': license['holder_name'],
+        'state': license['jurisdiction'],
+        'state_abbr': license['jurisdiction_abbr'],
+        'days_remaining': license['days_remaining'],
+        'expires_on': license['expires_on']
+    } for license in licenses_expiring_between(end=date.today() + timedelta(days=90))]
     
     # Calculate aggregate stats
     total_licensed = sum(1 for s in state_coverage.values() if s['licensed_count'] > 0)
     total_in_progress = sum(1 for s in state_coverage.values() if s['in_progress_count'] > 0)
-    total_licenses = sum(h.get('total_licenses', 0) for h in all_holders)
-    total_certificates = sum(h.get('total_certificates', 0) for h in all_holders)
+    total_licenses = summary['holder_total_licenses']
+    total_certificates = summary['total_certificates']
     
     # High-priority states (major markets we should target)
     high_priority_states = ['TX', 'CA', 'FL', 'NY', 'IL', 'PA', 'OH', 'GA', 'NC', 'MI']
     coverage_gaps = [s for s in high_priority_states if s not in state_coverage or state_coverage[s]['licensed_count'] == 0]
     
-    return jsonify({
-        'total_holders': len(all_holders),
+    return {
+        'total_holders': summary['total_holders'],
         'total_licenses': total_licenses,
         'total_certificates': total_certificates,
         'states_covered': total_licensed,
         'states_in_progress': total_in_progress,
         'state_coverage': state_coverage,
-        'expiring_soon': sorted(expiring_soon, key=lambda x: x['days_remaining']),
+        'expiring_soon': expiring_soon,
         'coverage_gaps': coverage_gaps
-    })
+    }
 
 
 
@@ -1082,7 +906,7 @@ def test_delete_cost(license_id, cost_index):
 def delete_cost(license_id, cost_index):
     """Delete a cost entry"""
     cost_index = int(cost_index)  # Convert to int
-    holder = load_license_holder_data(account)
+    holder = get_request_holder(account)
     
     if not holder:
         return jsonify({'success': False, 'error': 'Holder not found'}), 404
@@ -1124,13 +948,11 @@ def manage_licenses():
     
     # If manager requests a specific holder, show that holder's licenses
     if is_manager and requested_account and requested_account != 'director':
-        holder_data = load_license_holder_data(requested_account)
+        holder_data = get_request_holder(requested_account)
         if not holder_data:
             return "License holder not found", 404
         
-        enhanced_licenses = []
-        for license in holder_data.get('licenses', []):
-            enhanced_licenses.append(enhance_license_data(license))
+        enhanced_licenses = enhance_licenses(holder_data.get('licenses', []))
         
         return render_template('manage_licenses.html', 
                              holder=holder_data,
@@ -1142,20 +964,8 @@ def manage_licenses():
     
     # Handle director view - show all licenses
     if account == 'director':
-        import glob
-        all_licenses = []
-        all_holders = []
-        
-        holder_files = glob.glob('data/license_holders/*.json')
-        for holder_file in holder_files:
-            with open(holder_file, 'r') as f:
-                holder = json.load(f)
-                all_holders.append(holder)
-                
-                for license in holder.get('licenses', []):
-                    enhanced = enhance_license_data(license)
-                    enhanced['holder_name'] = holder['name']
-                    all_licenses.append(enhanced)
+        all_holders = load_all_holders()
+        all_licenses = enhance_team_licenses(all_holders)
         
         director_data = {
             'user_id': 'director',
@@ -1171,13 +981,11 @@ def manage_licenses():
                              is_director=True)
     
     # Individual license holder
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     if not holder_data:
         return "License holder not found", 404
     
-    enhanced_licenses = []
-    for license in holder_data.get('licenses', []):
-        enhanced_licenses.append(enhance_license_data(license))
+    enhanced_licenses = enhance_licenses(holder_data.get('licenses', []))
     
     return render_template('manage_licenses.html', 
                          holder=holder_data,
@@ -1197,7 +1005,7 @@ def save_license():
         return jsonify({'error': 'Missing required fields'}), 400
     
     # Load current holder data
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     if not holder_data:
         return jsonify({'error': 'License holder not found'}), 404
     
@@ -1227,7 +1035,7 @@ def delete_license():
         return jsonify({'error': 'Missing state abbreviation'}), 400
     
     # Load current holder data
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     if not holder_data:
         return jsonify({'error': 'License holder not found'}), 404
     
@@ -1256,7 +1064,7 @@ def edit_license(license_id):
     """Edit license form"""
     # Get account from session or URL parameter
     account = get_allowed_account()
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1277,7 +1085,7 @@ def update_license(license_id):
     """Update license data"""
     # Get account from session or URL parameter
     account = get_allowed_account()
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1357,7 +1165,7 @@ def add_license_form():
 def add_license():
     """Add a new license"""
     account = get_allowed_account()
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1438,7 +1246,7 @@ def cost_details(license_id):
     """View cost details for a license"""
     # Get account from session or URL parameter
     account = get_allowed_account()
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1459,7 +1267,7 @@ def add_cost(license_id):
     """Add a cost line item to a license"""
     # Get account from session or URL parameter
     account = get_allowed_account()
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1507,7 +1315,7 @@ def remove_cost():
     cost_index = int(data.get('cost_index'))
     
     account = get_allowed_account()
-    holder = load_license_holder_data(account)
+    holder = get_request_holder(account)
     
     if not holder:
         return jsonify({'success': False, 'error': 'Holder not found'}), 404
@@ -1555,7 +1363,7 @@ def update_estimated_costs(license_id):
     """Update estimated costs for budget planning"""
     # Get account from session or URL parameter
     account = get_allowed_account()
-    holder_data = load_license_holder_data(account)
+    holder_data = get_request_holder(account)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1589,63 +1397,47 @@ def update_estimated_costs(license_id):
         'test_duration_hours': float(request.form.get('test_duration_hours') or 0)
     }
     
-    # Save to database
-    success = add_cost_to_db(account, license_id, new_cost)
+    # Save the budget in one transaction; the form has no renewal/CE fields, so those keep their values
+    estimated = license_data['estimated_costs']
+    success = update_estimated_costs_in_db(account, license_id, {
+        **estimated,
+        'travel': estimated['travel_fee'],
+        'shipping': estimated['shipping_fee']
+    }, only_provided=True)
     
     if success:
         return redirect(f'/settings/cost-details/{license_id}?account={account}')
     else:
-        return "Error adding cost", 500
+        return "Error updating estimated costs", 500
 
 
 
 @app.route('/cost-analytics')
 def cost_analytics():
     """Cost analytics dashboard with year-by-year breakdown"""
-    from datetime import datetime
-    
     account = get_allowed_account()
     
     # Handle director view - aggregate all holders from database
     if account == 'director':
-        db = SessionLocal()
-        try:
-            all_licenses = []
-            all_holders_db = db.query(RSLicenseHolder).all()
-            all_holders = []
-            
-            for holder in all_holders_db:
-                # Load each holder's data using our function
-                holder_dict = load_license_holder_data(holder.employee_id or holder.pin)
-                if holder_dict:
-                    all_holders.append(holder_dict)
-                    
-                    for license in holder_dict.get('licenses', []):
-                        enhanced = enhance_license_data(license)
-                        enhanced['holder_name'] = holder_dict['name']
-                        all_licenses.append(enhanced)
-            
-            director_data = {
-                'user_id': 'director',
-                'name': 'Director View',
-                'role': 'Department Leadership',
-                'total_licenses': sum(h.get('total_licenses', 0) for h in all_holders),
-                'total_certificates': sum(h.get('total_certificates', 0) for h in all_holders)
-            }
-            
-            holder_data = director_data
-            enhanced_licenses = all_licenses
-        finally:
-            db.close()
+        all_holders = load_all_holders()
+        all_licenses = enhance_team_licenses(all_holders)
+
+        director_data = {
+            'user_id': 'director',
+            'name': 'Director View',
+            'role': 'Department Leadership',
+            'total_licenses': sum(h.get('total_licenses', 0) for h in all_holders),
+            'total_certificates': sum(h.get('total_certificates', 0) for h in all_holders)
+        }
+
+        holder_data = director_data
+        enhanced_licenses = all_licenses
     else:
-        holder_data = load_license_holder_data(account)
+        holder_data = get_request_holder(account)
         if not holder_data:
             return "License holder not found", 404
         
-        enhanced_licenses = []
-        for license in holder_data.get('licenses', []):
-            enhanced = enhance_license_data(license)
-            enhanced_licenses.append(enhanced)
+        enhanced_licenses = enhance_licenses(holder_data.get('licenses', []))
     
     # Calculate totals and year breakdown
     total_estimated = 0
@@ -1653,10 +1445,6 @@ def cost_analytics():
     total_variance = 0
     total_recurring = 0
     
-    # Year-by-year breakdown
-    years_data = {}
-    categories = {}
-    
     for license in enhanced_licenses:
         # Sum overall totals
         total_estimated += license['cost_totals']['initial_estimated']
@@ -1668,51 +1456,12 @@ def cost_analytics():
         recurring_per_period = license['cost_totals']['recurring_cost']
         annual_recurring = recurring_per_period / period_years if period_years > 0 else 0
         total_recurring += annual_recurring
-        
-        # Break down actual costs by year
-        for cost_item in license.get('actual_costs', []):
-            date_str = cost_item.get('date', '')
-            amount = cost_item.get('amount', 0)
-            category = cost_item.get('category', 'other_fee')
-            
-            # Extract year from date
-            try:
-                if date_str:
-                    year = datetime.strptime(date_str, '%Y-%m-%d').year
-                else:
-                    year = 'Unknown'
-            except:
-                year = 'Unknown'
-            
-            # Add to year totals
-            if year not in years_data:
-                years_data[year] = {
-                    'year': year,
-                    'total_spent': 0,
-                    'license_count': set(),
-                    'categories': {}
-                }
-            
-            years_data[year]['total_spent'] += amount
-            years_data[year]['license_count'].add(license.get('license_id'))
-            
-            # Category breakdown within year
-            if category not in years_data[year]['categories']:
-                years_data[year]['categories'][category] = 0
-            years_data[year]['categories'][category] += amount
-            
-            # Overall category totals
-            categories[category] = categories.get(category, 0) + amount
-    
-    # Convert year license counts from set to int
-    for year in years_data:
-        years_data[year]['license_count'] = len(years_data[year]['license_count'])
-    
-    # Sort years (most recent first)
-    years_list = sorted(years_data.values(), key=lambda x: x['year'] if isinstance(x['year'], int) else 0, reverse=True)
     
-    # Sort categories by amount
-    categories = dict(sorted(categories.items(), key=lambda x: x[1], reverse=True))
+    # Year-by-year and category breakdowns of actual costs, from the same
+    # SQL rollups as the PDF export so both report the same numbers
+    rollups = cost_rollups() if account == 'director' else cost_rollups(holder=account)
+    years_list = rollups['by_year']
+    categories = rollups['by_category']
     
     totals = {
         'total_estimated': total_estimated,
@@ -1732,24 +1481,20 @@ def cost_analytics():
 @app.route('/team/manage')
 def manage_team():
     """Manage license holders"""
-    import glob
-    
     holders = []
-    holder_files = glob.glob('data/license_holders/*.json')
     
-    for holder_file in holder_files:
-        with open(holder_file, 'r') as f:
-            holder = json.load(f)
-            
-            # Find the PIN for this holder
-            holder_pin = None
-            for pin, user in USERS.items():
-                if user.get('user_id') == holder.get('user_id'):
-                    holder_pin = pin
-                    break
-            
-            holder['pin'] = holder_pin
-            holders.append(holder)
+    for team_holder in get_request_team_holders():
+        holder = dict(team_holder)
+        
+        # Find the PIN for this holder
+        holder_pin = None
+        for pin, user in USERS.items():
+            if user.get('user_id') == holder.get('user_id'):
+                holder_pin = pin
+                break
+        
+        holder['pin'] = holder_pin or holder.get('pin')
+        holders.append(holder)
     
     # Sort by name
     holders.sort(key=lambda x: x.get('name', ''))
@@ -1790,7 +1535,7 @@ def add_holder():
 @app.route('/team/edit-holder/<user_id>')
 def edit_holder(user_id):
     """Edit a license holder"""
-    holder_data = load_license_holder_data(user_id)
+    holder_data = get_request_holder(user_id)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1802,7 +1547,7 @@ def update_holder(user_id):
     """Update license holder info"""
     import os
     
-    holder_data = load_license_holder_data(user_id)
+    holder_data = get_request_holder(user_id)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1827,37 +1572,14 @@ def update_holder(user_id):
 
 
 
-@app.route('/team/view/<user_id>')
-def team_view_employee(user_id):
-    """Detailed view of a specific employee (Manager only)"""
-    # Check if user is manager
-    if session.get('user_type') != 'manager':
-        return "Access denied", 403
-    
-    # Load employee data
-    employee_data = load_license_holder_data(user_id)
-    
-    if not employee_data:
-        return "Employee not found", 404
-    
-    # Calculate stats
-    licenses = employee_data.get('licenses', [])
-    states_count = len(set(lic.get('jurisdiction_abbr') for lic in licenses if lic.get('jurisdiction_abbr')))
-    expiring_count = sum(1 for lic in licenses 
-                        if lic.get('expires_on') and calculate_days_remaining(lic.get('expires_on')) 
-                        and calculate_days_remaining(lic.get('expires_on')) <= 60)
-    
-    # Calculate costs
+def summarize_employee_costs(enhanced_licenses):
+    """Cost totals and per-state breakdown for one holder's enhanced licenses (employee view and packets)"""
     total_estimated = 0
     total_actual = 0
     annual_recurring = 0
     costs_by_state = {}
     
-    enhanced_licenses = []
-    for license in licenses:
-        enhanced = enhance_license_data(license)
-        enhanced_licenses.append(enhanced)
-        
+    for enhanced in enhanced_licenses:
         total_estimated += enhanced['cost_totals']['initial_estimated']
         total_actual += enhanced['cost_totals']['actual_spent']
         
@@ -1866,7 +1588,7 @@ def team_view_employee(user_id):
         annual_recurring += recurring_per_period / period_years if period_years > 0 else 0
         
         # Group by state
-        state = license.get('jurisdiction')
+        state = enhanced.get('jurisdiction')
         if state:
             if state not in costs_by_state:
                 costs_by_state[state] = {'state': state, 'initial': 0, 'renewal': 0, 'total': 0}
@@ -1874,18 +1596,39 @@ def team_view_employee(user_id):
             costs_by_state[state]['renewal'] += enhanced['cost_totals']['recurring_cost']
             costs_by_state[state]['total'] += enhanced['cost_totals']['initial_estimated'] + enhanced['cost_totals']['recurring_cost']
     
-    stats = {
-        'states_count': states_count,
-        'expiring_count': expiring_count,
-        'annual_cost': annual_recurring
-    }
-    
-    costs = {
+    return {
         'total_estimated': total_estimated,
         'total_actual': total_actual,
         'annual_recurring': annual_recurring,
         'by_state': sorted(costs_by_state.values(), key=lambda x: x['total'], reverse=True)
     }
+
+@app.route('/team/view/<user_id>')
+def team_view_employee(user_id):
+    """Detailed view of a specific employee (Manager only)"""
+    # Check if user is manager
+    if session.get('user_type') != 'manager':
+        return "Access denied", 403
+    
+    # Load employee data
+    employee_data = get_request_holder(user_id)
+    
+    if not employee_data:
+        return "Employee not found", 404
+    
+    # Calculate stats
+    licenses = employee_data.get('licenses', [])
+    states_count = len(set(lic.get('jurisdiction_abbr') for lic in licenses if lic.get('jurisdiction_abbr')))
+    expiring_count = count_licenses_expiring_between(end=date.today() + timedelta(days=60), holder=user_id)
+    
+    enhanced_licenses = enhance_licenses(licenses)
+    costs = summarize_employee_costs(enhanced_licenses)
+    
+    stats = {
+        'states_count': states_count,
+        'expiring_count': expiring_count,
+        'annual_cost': costs['annual_recurring']
+    }
     
     # Try to load bio data
     bio = None
@@ -1902,10 +1645,65 @@ def team_view_employee(user_id):
                          costs=costs,
                          bio=bio)
 
+@app.route('/team/export-packets')
+def export_holder_packets():
+    """ZIP of per-holder license & cost packets (Manager only; ?holders=a,b limits it)"""
+    from werkzeug.utils import secure_filename
+    
+    if session.get('user_type') != 'manager':
+        return "Access denied", 403
+    
+    wanted = {h.strip() for h in request.args.get('holders', '').split(',') if h.strip()}
+    holders = [
+        holder for holder in load_all_holders(include_costs=False)
+        if not wanted or holder['user_id'] in wanted or holder.get('pin') in wanted
+    ]
+    if not holders:
+        return "No matching license holders", 404
+    
+    expiring_counts = expiring_counts_by_holder(end=date.today() + timedelta(days=EXPIRING_SOON_DAYS))
+    packets = [holder_packet_data(holder, expiring_counts.get(holder['user_id'], 0)) for holder in holders]
+    for packet in packets:
+        packet['filename'] = f"{secure_filename(packet['user_id']) or 'holder'}_packet.pdf"
+    
+    return Response(stream_packets_zip(packets), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment; filename=license_packets_{date.today().isoformat()}.zip'
+    })
+
+
+def holder_packet_data(holder, expiring_count):
+    """Plain-dict packet for holder_packets.render_holder_packet (same figures as team_view_employee)"""
+    enhanced_licenses = enhance_licenses(holder.get('licenses', []))
+    costs = summarize_employee_costs(enhanced_licenses)
+    
+    return {
+        'user_id': holder['user_id'],
+        'name': holder.get('name'),
+        'role': holder.get('role'),
+        'stats': {
+            'states_count': len({lic['jurisdiction_abbr'] for lic in enhanced_licenses if lic.get('jurisdiction_abbr')}),
+            'expiring_count': expiring_count,
+            'expiring_days': EXPIRING_SOON_DAYS,
+            'annual_cost': costs['annual_recurring']
+        },
+        'costs': costs,
+        'licenses': [
+            {
+                'jurisdiction': lic.get('jurisdiction'),
+                'license_type': lic.get('license_type'),
+                'badge_text': lic.get('badge_text'),
+                'expires_on': lic.get('expires_on'),
+                'budget': lic['cost_totals']['initial_estimated'],
+                'actual': lic['cost_totals']['actual_spent']
+            }
+            for lic in enhanced_licenses
+        ]
+    }
+
 @app.route('/bio/<user_id>')
 def bio_builder(user_id):
     """Bio builder page for a license holder"""
-    holder_data = load_license_holder_data(user_id)
+    holder_data = get_request_holder(user_id)
     
     if not holder_data:
         return "License holder not found", 404
@@ -1943,7 +1741,7 @@ def update_bio_section(user_id, section):
     """Update a section of the bio"""
     import os
     
-    holder_data = load_license_holder_data(user_id)
+    holder_data = get_request_holder(user_id)
     
     if not holder_data:
         return "License holder not found", 404
@@ -2014,7 +1812,7 @@ def add_work_history(user_id):
     """Add a comprehensive work history entry"""
     import os
     
-    holder_data = load_license_holder_data(user_id)
+    holder_data = get_request_holder(user_id)
     
     if not holder_data:
         return "License holder not found", 404
@@ -2126,7 +1924,7 @@ def add_reference(user_id):
     """Add a professional reference"""
     import os
     
-    holder_data = load_license_holder_data(user_id)
+    holder_data = get_request_holder(user_id)
     
     if not holder_data:
         return "License holder not found", 404
@@ -2174,7 +1972,7 @@ def add_job_project(user_id):
     """Add a job project to the library"""
     import os
     
-    holder_data = load_license_holder_data(user_id)
+    holder_data = get_request_holder(user_id)
     
     if not holder_data:
         return "License holder not found", 404
@@ -2230,11 +2028,8 @@ def import_csv_page():
 
 @app.route('/import-csv', methods=['POST'])
 def import_csv():
-    """Handle CSV file upload and import"""
-    import csv
-    import io
-    import os
-    import re
+    """Handle CSV file upload and queue the import as a background job"""
+    import tempfile
     
     if 'csv_file' not in request.files:
         return "No file uploaded", 400
@@ -2243,154 +2038,51 @@ def import_csv():
     license_holder = request.form.get('license_holder', 'bhambrick')
     overwrite = 'overwrite_existing' in request.form
     
+    # Only managers may import for other holders (or many at once)
+    if session.get('user_type') != 'manager':
+        if license_holder == MULTI_HOLDER_IMPORT:
+            return "Access denied", 403
+        license_holder = get_allowed_account()
+    
     if file.filename == '':
         return "No file selected", 400
     
-    # Read CSV
-    stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-    csv_reader = csv.DictReader(stream)
+    # The request stream is gone once we return, so spool the upload to disk for the job
+    fd, upload_path = tempfile.mkstemp(prefix='csv_import_', suffix='.csv')
+    with os.fdopen(fd, 'wb') as f:
+        file.save(f)
     
-    # Load license holder data
-    holder_data = load_license_holder_data(license_holder)
-    if not holder_data:
-        return "License holder not found", 404
-    
-    # State name to abbreviation mapping
-    state_mapping = {
-        'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR',
-        'california': 'CA', 'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE',
-        'florida': 'FL', 'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID',
-        'illinois': 'IL', 'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS',
-        'kentucky': 'KY', 'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
-        'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN', 'mississippi': 'MS',
-        'missouri': 'MO', 'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV',
-        'new hampshire': 'NH', 'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY',
-        'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH', 'oklahoma': 'OK',
-        'oregon': 'OR', 'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC',
-        'south dakota': 'SD', 'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT',
-        'vermont': 'VT', 'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV',
-        'wisconsin': 'WI', 'wyoming': 'WY'
-    }
-    
-    def clean_currency(value):
-        """Remove $, commas and convert to float"""
-        if not value or value.strip() == '':
-            return 0.0
-        cleaned = re.sub(r'[\$,]', '', str(value))
-        try:
-            return float(cleaned)
-        except:
-            return 0.0
-    
-    def parse_renewal_period(value):
-        """Extract years from renewal period"""
-        if not value:
-            return 2
-        match = re.search(r'(\d+)', str(value))
-        return int(match.group(1)) if match else 2
-    
-    def parse_hours(value):
-        """Extract hours from string"""
-        if not value:
-            return 0
-        match = re.search(r'(\d+)', str(value))
-        return int(match.group(1)) if match else 0
-    
-    imported_count = 0
-    updated_count = 0
-    
-    for row in csv_reader:
-        # Get state info
-        state_raw = row.get('State', '').strip()
-        if not state_raw:
-            continue
-        
-        # Convert state name to abbreviation
-        state_abbr = state_raw.upper() if len(state_raw) == 2 else state_mapping.get(state_raw.lower(), state_raw[:2].upper())
-        
-        # Find or create license for this state
-        license_data = None
-        for lic in holder_data.get('licenses', []):
-            if lic.get('jurisdiction_abbr') == state_abbr:
-                license_data = lic
-                break
-        
-        if not license_data:
-            # Create new license
-            license_id = f"{state_abbr}-{len(holder_data.get('licenses', [])) + 1:03d}"
-            license_data = {
-                'license_id': license_id,
-                'jurisdiction': state_raw if len(state_raw) > 2 else state_abbr,
-                'jurisdiction_abbr': state_abbr,
-                'jurisdiction_type': 'state',
-                'license_type': row.get('License Type', 'Master Plumber'),
-                'status': 'not_licensed',
-                'estimated_costs': {},
-                'actual_costs': [],
-                'recurring': {},
-                'planning': {}
-            }
-            holder_data['licenses'].append(license_data)
-            imported_count += 1
-        else:
-            updated_count += 1
-        
-        # Update estimated costs (only if overwrite is true OR field is empty)
-        if overwrite or not license_data.get('estimated_costs'):
-            license_data['estimated_costs'] = {}
-        
-        costs = license_data['estimated_costs']
-        
-        if overwrite or not costs.get('application_fee'):
-            costs['application_fee'] = clean_currency(row.get('Application Fees', 0))
-        if overwrite or not costs.get('test_fee'):
-            costs['test_fee'] = clean_currency(row.get('Test Fees', 0))
-        if overwrite or not costs.get('trade_book_fee'):
-            costs['trade_book_fee'] = clean_currency(row.get('Trade Book fees', 0))
-        if overwrite or not costs.get('business_law_book_fee'):
-            costs['business_law_book_fee'] = clean_currency(row.get('Bus. & Law Book Fee', 0))
-        if overwrite or not costs.get('activation_fee'):
-            costs['activation_fee'] = clean_currency(row.get('Lic. Activation Fee', 0))
-        if overwrite or not costs.get('prep_course_fee'):
-            costs['prep_course_fee'] = clean_currency(row.get('Prep Course fees', 0))
-        if overwrite or not costs.get('travel_fee'):
-            costs['travel_fee'] = clean_currency(row.get('Travel Fees', 0))
-        if overwrite or not costs.get('shipping_fee'):
-            costs['shipping_fee'] = clean_currency(row.get('Shipping Fees', 0))
-        
-        # Update recurring costs
-        if overwrite or not license_data.get('recurring'):
-            license_data['recurring'] = {}
-        
-        recurring = license_data['recurring']
-        if overwrite or not recurring.get('renewal_fee'):
-            recurring['renewal_fee'] = clean_currency(row.get('Renewal Fees', 0))
-        if overwrite or not recurring.get('continuing_ed_fee'):
-            recurring['continuing_ed_fee'] = clean_currency(row.get('Cont. Ed. Fees', 0))
-        if overwrite or not recurring.get('renewal_period_years'):
-            recurring['renewal_period_years'] = parse_renewal_period(row.get('Renewal Period', '2 Years'))
-        
-        # Update planning
-        if overwrite or not license_data.get('planning'):
-            license_data['planning'] = {}
-        
-        planning = license_data['planning']
-        if overwrite or not planning.get('est_study_hours'):
-            planning['est_study_hours'] = parse_hours(row.get('Est. Study Hrs.', 0))
-        if overwrite or not planning.get('test_duration_hours'):
-            planning['test_duration_hours'] = parse_hours(row.get('Test Duration', 0))
-    
-    # Bulk import to database
-    success, message = bulk_import_licenses(license_holder, holder_data.get('licenses', []))
+    job_id = submit_job('csv_import', run_csv_import_job, upload_path, license_holder, overwrite, owner=session.get('user_id'))
+    return redirect(f'/jobs/{job_id}/wait')
+
+
+def run_csv_import_job(progress, upload_path, license_holder, overwrite):
+    """Background job: import a spooled CSV upload, then remove it"""
+    try:
+        progress(5, 'Importing rows')
+        with open(upload_path, 'r', encoding='utf-8-sig', newline='') as stream:
+            if license_holder == MULTI_HOLDER_IMPORT:
+                report = import_multi_holder_rows(read_license_rows(stream), overwrite=overwrite)
+                return {'data': {'multi_holder': True, 'report': report}}
+            
+            success, result = import_license_rows(license_holder, read_license_rows(stream), overwrite=overwrite)
+    finally:
+        os.remove(upload_path)
     
     if not success:
-        print(f"Bulk import warning: {message}")
+        raise RuntimeError("License holder not found" if result == "Holder not found" else f"Error importing CSV: {result}")
+    
+    return {'data': {'multi_holder': False, 'license_holder': license_holder, **result}}
+
+
+def render_import_success(license_holder, imported_count, updated_count):
+    """Result page for a single-holder CSV import; redirects to cost analytics"""
+    from markupsafe import escape
     
-    # Redirect to cost analytics with success message
     return f'''
     <html>
     <head>
-        <meta http-equiv="refresh" content="3;url=/cost-analytics?account={license_holder}">
+        <meta http-equiv="refresh" content="3;url=/cost-analytics?account={escape(license_holder)}">
         <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
     </head>
     <body class="bg-light">
@@ -2408,6 +2100,48 @@ def import_csv():
     </html>
     '''
 
+def render_multi_holder_import_report(report):
+    """Consolidated result page for a multi-holder CSV import"""
+    from markupsafe import escape
+    
+    rows_html = ''.join(
+        f"<tr><td>{escape(holder)}</td><td>{stats['created']}</td><td>{stats['updated']}</td>"
+        f"<td>{stats['skipped']}</td><td class='text-success'>OK</td></tr>"
+        for holder, stats in sorted(report['holders'].items())
+    )
+    rows_html += ''.join(
+        f"<tr><td>{escape(holder)}</td><td colspan='3'></td><td class='text-danger'>{escape(error)}</td></tr>"
+        for holder, error in sorted(report['failed'].items())
+    )
+    totals = report['totals']
+    
+    return f'''
+    <html>
+    <head>
+        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
+    </head>
+    <body class="bg-light">
+        <div class="container mt-5">
+            <div class="card">
+                <div class="card-body">
+                    <h3 class="{'text-warning' if report['failed'] else 'text-success'}">
+                        {'⚠️ Import finished with errors' if report['failed'] else '✅ Import Successful!'}
+                    </h3>
+                    <p class="lead">{totals['created']} new licenses created, {totals['updated']} existing licenses updated
+                        across {len(report['holders'])} holders</p>
+                    {f"<p class='text-muted'>{report['rows_without_holder']} rows had no Holder and were ignored</p>" if report['rows_without_holder'] else ''}
+                    <table class="table table-sm">
+                        <thead><tr><th>Holder</th><th>Created</th><th>Updated</th><th>Skipped</th><th>Result</th></tr></thead>
+                        <tbody>{rows_html}</tbody>
+                    </table>
+                    <a href="/cost-analytics?account=director" class="btn btn-primary">Go to Cost Analytics</a>
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
+    '''
+
 @app.route('/download-csv-template')
 def download_csv_template():
     """Download CSV template"""
@@ -2452,17 +2186,11 @@ def download_csv_template():
 @app.route('/state/<state_abbr>')
 def state_detail(state_abbr):
     """Display detailed state licensing information"""
-    import os
-    
-    # Load state detail data
-    state_file = os.path.join('data', 'state_details', f'{state_abbr.upper()}.json')
+    state_data = state_details.get(state_abbr)
     
-    if not os.path.exists(state_file):
+    if state_data is None:
         return f"State information for {state_abbr.upper()} not yet available. We're building this database state by state!", 404
     
-    with open(state_file, 'r') as f:
-        state_data = json.load(f)
-    
     return render_template('state_detail.html', state=state_data)
 
 
@@ -2499,28 +2227,17 @@ def format_date(date_string):
 def admin_state_encyclopedia():
     """Admin page to manage state detail files"""
     print("🔍 DEBUG: admin_state_encyclopedia route hit!")
-    import os
-    import glob
-    
-    state_files = glob.glob('data/state_details/*.json')
-    states = []
-    
-    for file_path in state_files:
-        with open(file_path, 'r') as f:
-            state_data = json.load(f)
-            
-            # Calculate completion percentage
-            completion = calculate_state_completion(state_data)
-            
-            states.append({
-                'abbr': state_data['state_abbr'],
-                'name': state_data['state'],
-                'completion': completion,
-                'file_path': file_path
-            })
     
-    # Sort by name
-    states.sort(key=lambda x: x['name'])
+    # Served from the in-memory index, already scored and sorted by name
+    states = [
+        {
+            'abbr': state['abbr'],
+            'name': state['name'],
+            'completion': state['completion'],
+            'file_path': state['file_path']
+        }
+        for state in state_details.summaries()
+    ]
     
     return render_template('admin_state_encyclopedia.html', states=states)
 
@@ -2530,62 +2247,40 @@ def admin_state_encyclopedia():
 @app.route('/states/directory')
 def states_directory():
     """Read-only state requirements directory for license holders"""
-    import os
-    import glob
-    
-    state_files = glob.glob('data/state_details/*.json')
-    states = []
-    
-    for file_path in state_files:
-        with open(file_path, 'r') as f:
-            state_data = json.load(f)
-            
-            # Calculate completion percentage
-            completion = calculate_state_completion(state_data)
-            
-            states.append({
-                'abbr': state_data['state_abbr'],
-                'name': state_data['state'],
-                'completion': completion,
-                'governing_body': state_data.get('governing_body', 'N/A'),
-                'board_phone': state_data.get('board_phone', 'N/A')
-            })
-    
-    # Sort by name
-    states.sort(key=lambda x: x['name'])
+    # Served from the in-memory index, already scored and sorted by name
+    states = [
+        {
+            'abbr': state['abbr'],
+            'name': state['name'],
+            'completion': state['completion'],
+            'governing_body': state['data'].get('governing_body', 'N/A'),
+            'board_phone': state['data'].get('board_phone', 'N/A')
+        }
+        for state in state_details.summaries()
+    ]
     
     return render_template('states_directory.html', states=states)
 
 @app.route('/admin/edit-state/<state_abbr>')
 def admin_edit_state(state_abbr):
     """Edit a specific state's details"""
-    import os
+    state_data = state_details.get(state_abbr)
     
-    file_path = os.path.join('data', 'state_details', f'{state_abbr.upper()}.json')
-    
-    if not os.path.exists(file_path):
+    if state_data is None:
         return f"State file not found for {state_abbr}", 404
     
-    with open(file_path, 'r') as f:
-        state_data = json.load(f)
-    
     return render_template('admin_edit_state.html', state=state_data)
 
 
 @app.route('/admin/save-state/<state_abbr>', methods=['POST'])
 def admin_save_state(state_abbr):
     """Save updated state details"""
-    import os
-    
-    file_path = os.path.join('data', 'state_details', f'{state_abbr.upper()}.json')
-    
     # Get JSON data from form
     try:
         state_data = json.loads(request.form.get('state_data'))
         
-        # Save to file
-        with open(file_path, 'w') as f:
-            json.dump(state_data, f, indent=2)
+        # Save to file and refresh the in-memory index
+        state_details.save_state(state_abbr, state_data)
         
         return redirect(f'/admin/edit-state/{state_abbr}?success=1')
     
@@ -2593,88 +2288,27 @@ def admin_save_state(state_abbr):
         return f"Error saving state: {str(e)}", 500
 
 
-def calculate_state_completion(state_data):
-    """Calculate what percentage of state data is filled out"""
-    total_fields = 0
-    filled_fields = 0
-    
-    # Basic info (5 fields)
-    basic_fields = ['governing_body', 'board_phone', 'board_website', 'board_address']
-    total_fields += len(basic_fields)
-    filled_fields += sum(1 for f in basic_fields if state_data.get(f) and state_data.get(f) != 'TBD' and '000-000' not in str(state_data.get(f)))
-    
-    # License types (count as 1 major section)
-    total_fields += 1
-    if state_data.get('license_types') and len(state_data['license_types']) > 0:
-        first_license = state_data['license_types'][0]
-        if first_license.get('experience_required') != 'TBD':
-            filled_fields += 1
-    
-    # Requirements (count as 1 major section)
-    total_fields += 1
-    if state_data.get('requirements', {}).get('education') != 'TBD':
-        filled_fields += 1
-    
-    # Examination (count as 1 major section)
-    total_fields += 1
-    if state_data.get('examination', {}).get('provider') != 'TBD':
-        filled_fields += 1
-    
-    # Application process (count as 1 major section)
-    total_fields += 1
-    if state_data.get('application_process') and len(state_data['application_process']) > 1:
-        filled_fields += 1
-    
-    # Renewal (count as 1 major section)
-    total_fields += 1
-    renewal_fee = state_data.get('renewal', {}).get('renewal_fee', 0)
-    # Handle both string and int renewal fees
-    if renewal_fee and str(renewal_fee).strip() and renewal_fee != 0:
-        filled_fields += 1
-    
-    return int((filled_fields / total_fields) * 100) if total_fields > 0 else 0
-
-
 @app.route('/admin/active-states')
 def admin_active_states():
     """Manage active states (Manager only)"""
     if session.get('user_type') != 'manager':
         return "Access denied", 403
     
-    import os
-    import glob
-    
     # Load coverage data
-    coverage = {}
-    coverage_file = 'data/company/coverage.json'
-    if os.path.exists(coverage_file):
-        with open(coverage_file, 'r') as f:
-            coverage = json.load(f)
+    coverage = load_reference_json('data/company/coverage.json', {})
     
     # Load all state names
-    all_states = {}
-    base_states_file = 'data/base_data/all_states.json'
-    if os.path.exists(base_states_file):
-        with open(base_states_file, 'r') as f:
-            states_data = json.load(f)
-            all_states = {abbr: data['name'] for abbr, data in states_data.items()}
+    states_data = load_reference_json('data/base_data/all_states.json', {})
+    all_states = {abbr: data['name'] for abbr, data in states_data.items()}
     
     # Build state names lookup
     state_names = all_states
     
     # Get details about who is licensed in each state
-    state_details = {}
-    holder_files = glob.glob('data/license_holders/*.json')
-    for holder_file in holder_files:
-        with open(holder_file, 'r') as f:
-            holder = json.load(f)
-            for license in holder.get('licenses', []):
-                abbr = license.get('jurisdiction_abbr')
-                if abbr:
-                    if abbr not in state_details:
-                        state_details[abbr] = {'holders': []}
-                    if holder['name'] not in state_details[abbr]['holders']:
-                        state_details[abbr]['holders'].append(holder['name'])
+    state_details = {
+        abbr: {'holders': [h['name'] for h in state['holders']]}
+        for abbr, state in get_request_state_rollup().items()
+    }
     
     # Load revenues (from coverage or separate file)
     state_revenues = coverage.get('state_revenues', {})
@@ -2820,13 +2454,10 @@ def lock_account(user_id):
     if session.get('user_type') != 'manager':
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
     
-    holder_file = f'data/license_holders/{user_id}.json'
-    if not os.path.exists(holder_file):
+    holder = load_license_holder_data(user_id)
+    if not holder:
         return jsonify({'success': False, 'error': 'User not found'}), 404
     
-    with open(holder_file, 'r') as f:
-        holder = json.load(f)
-    
     # Update status in database
     success = update_holder_status(user_id, 'locked', session.get('name', 'Manager'))
     
@@ -2841,13 +2472,10 @@ def unlock_account(user_id):
     if session.get('user_type') != 'manager':
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
     
-    holder_file = f'data/license_holders/{user_id}.json'
-    if not os.path.exists(holder_file):
+    holder = load_license_holder_data(user_id)
+    if not holder:
         return jsonify({'success': False, 'error': 'User not found'}), 404
     
-    with open(holder_file, 'r') as f:
-        holder = json.load(f)
-    
     # Update status in database
     success = update_holder_status(user_id, 'active')
     
@@ -2903,14 +2531,12 @@ def create_account():
     user_id = name.lower().replace(' ', '').replace('.', '')[:20]
     
     # Check if user_id already exists
-    holder_file = f'data/license_holders/{user_id}.json'
-    if os.path.exists(holder_file):
+    if holder_exists(user_id):
         # Add a number suffix
         counter = 2
-        while os.path.exists(f'data/license_holders/{user_id}{counter}.json'):
+        while holder_exists(f'{user_id}{counter}'):
             counter += 1
         user_id = f'{user_id}{counter}'
-        holder_file = f'data/license_holders/{user_id}.json'
     
     # Generate unique PIN (200XXX series)
     import random
@@ -2920,22 +2546,6 @@ def create_account():
         if pin not in existing_pins:
             break
     
-    # Create holder data
-    holder = {
-        'user_id': user_id,
-        'name': name,
-        'role': role,
-        'email': email,
-        'account_status': 'active',
-        'locked_date': None,
-        'locked_by': None,
-        'total_licenses': 0,
-        'total_certificates': 0,
-        'licenses': [],
-        'created_date': datetime.now().strftime('%Y-%m-%d'),
-        'created_by': session.get('name', 'Manager')
-    }
-    
     # Save to database
     success, message = create_new_holder(user_id, name, role, pin=pin)
     
@@ -2977,16 +2587,10 @@ def set_license_goal(user_id):
     target_state = request.form.get('target_state')
     print(f"DEBUG: target_state={target_state}")
     
-    holder_file = f'data/license_holders/{user_id}.json'
-    print(f"DEBUG: holder_file={holder_file}, exists={os.path.exists(holder_file)}")
-    
-    if not os.path.exists(holder_file):
-        print("DEBUG: Holder file not found")
+    if not holder_exists(user_id):
+        print("DEBUG: Holder not found")
         return redirect('/team/manage')
     
-    with open(holder_file, 'r') as f:
-        holder = json.load(f)
-    
     # Set in database
     success = set_next_target_state(user_id, target_state)
     
@@ -3001,13 +2605,9 @@ def clear_license_goal(user_id):
     if session.get('user_type') != 'manager':
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
     
-    holder_file = f'data/license_holders/{user_id}.json'
-    if not os.path.exists(holder_file):
+    if not holder_exists(user_id):
         return jsonify({'success': False, 'error': 'User not found'}), 404
     
-    with open(holder_file, 'r') as f:
-        holder = json.load(f)
-    
     # Clear goal in database
     success = clear_next_target_state(user_id)
     
@@ -3021,45 +2621,91 @@ def clear_license_goal(user_id):
 @app.route('/export-cost-report')
 @app.route('/cost-analytics/export-pdf')
 def export_cost_analytics_pdf():
-    """Generate PDF cost analytics report"""
+    """Generate PDF cost analytics report (?background=1 queues it as a job)"""
+    account = get_allowed_account()
+    download_name = f'cost_analytics_{datetime.now().strftime("%Y-%m-%d")}.pdf'
+    
+    # Unchanged cost data: serve the PDF built last time, even for background requests
+    stamp = cost_report_stamp(account)
+    pdf = report_cache.get(account, stamp)
+    if pdf is not None:
+        return send_file(io.BytesIO(pdf), as_attachment=True, download_name=download_name, mimetype='application/pdf')
+    
+    if request.args.get('background'):
+        job_id = submit_job('cost_report', run_cost_report_job, account, stamp, download_name, owner=session.get('user_id'))
+        return redirect(f'/jobs/{job_id}/wait')
+    
+    spool, size = spool_cost_report(account, stamp)
+    
+    def chunks():
+        with spool:
+            while True:
+                chunk = spool.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    
+    return Response(chunks(), mimetype='application/pdf', headers={
+        'Content-Length': str(size),
+        'Content-Disposition': f'attachment; filename={download_name}'
+    })
+
+
+def run_cost_report_job(progress, account, stamp, download_name):
+    """Background job: build the cost analytics PDF for download and cache it"""
+    progress(10, 'Building report')
+    spool, _ = spool_cost_report(account, stamp)
+    return {
+        'data': {'download_name': download_name},
+        'file': (download_name, 'application/pdf', spool)
+    }
+
+
+def spool_cost_report(account, stamp):
+    """
+    Build the cost analytics PDF into a spooled temp file and cache it if small enough
+
+    The document stays in memory up to PDF_SPOOL_MAX_MEMORY and goes to disk
+    past that, so company-wide reports don't hold a second full copy in RAM.
+    Returns (spool rewound to the start, size in bytes); the caller closes it.
+    """
+    import tempfile
+    
+    spool = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY)
+    write_cost_report_pdf(account, spool)
+    size = spool.tell()
+    spool.seek(0)
+    
+    if report_cache.accepts(size):
+        report_cache.set(account, stamp, spool.read())
+        spool.seek(0)
+    
+    return spool, size
+
+
+def write_cost_report_pdf(account, out):
+    """Write the cost analytics PDF for an account ('director' for the whole team) to a binary file"""
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import letter, landscape
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import inch
     from reportlab.lib.enums import TA_CENTER, TA_RIGHT
-    from io import BytesIO
     from datetime import datetime
     
-    # Get the same data as the analytics page
-    account = get_allowed_account()
-    
+    # The report only needs cost totals, so the director report skips
+    # loading cost lines and takes every breakdown from SQL rollups
     if account == 'director':
-        import glob
-        all_licenses = []
-        
-        holder_files = glob.glob('data/license_holders/*.json')
-        for holder_file in holder_files:
-            with open(holder_file, 'r') as f:
-                holder = json.load(f)
-                for license in holder.get('licenses', []):
-                    enhanced = enhance_license_data(license)
-                    enhanced['holder_name'] = holder['name']
-                    all_licenses.append(enhanced)
-        
-        enhanced_licenses = all_licenses
+        enhanced_licenses = enhance_team_licenses(load_all_holders(include_costs=False))
+        rollups = cost_rollups()
     else:
-        holder_data = load_license_holder_data(account)
-        enhanced_licenses = []
-        for license in holder_data.get('licenses', []):
-            enhanced = enhance_license_data(license)
-            enhanced_licenses.append(enhanced)
+        holder_data = load_license_holder_data(account) or {}
+        enhanced_licenses = enhance_licenses(holder_data.get('licenses', []))
+        rollups = cost_rollups(holder=account)
     
     # Calculate totals and year breakdown
     total_actual = 0
     total_recurring = 0
-    years_data = {}
-    categories = {}
     
     for license in enhanced_licenses:
         total_actual += license['cost_totals']['actual_spent']
@@ -3068,40 +2714,12 @@ def export_cost_analytics_pdf():
         recurring_per_period = license['cost_totals']['recurring_cost']
         annual_recurring = recurring_per_period / period_years if period_years > 0 else 0
         total_recurring += annual_recurring
-        
-        for cost_item in license.get('actual_costs', []):
-            date_str = cost_item.get('date', '')
-            amount = cost_item.get('amount', 0)
-            
-            try:
-                if date_str:
-                    year = datetime.strptime(date_str, '%Y-%m-%d').year
-                else:
-                    year = 'Unknown'
-            except:
-                year = 'Unknown'
-            
-            if year not in years_data:
-                years_data[year] = {'year': year, 'total_spent': 0, 'license_count': set()}
-            
-            years_data[year]['total_spent'] += amount
-            years_data[year]['license_count'].add(license.get('license_id'))
-            
-            # Track categories
-            category = cost_item.get('category', 'other_fee')
-            categories[category] = categories.get(category, 0) + amount
-    
-    # Sort categories by amount
-    categories = dict(sorted(categories.items(), key=lambda x: x[1], reverse=True))
-    
-    for year in years_data:
-        years_data[year]['license_count'] = len(years_data[year]['license_count'])
     
-    years_list = sorted(years_data.values(), key=lambda x: x['year'] if isinstance(x['year'], int) else 0, reverse=True)
+    years_list = rollups['by_year']
+    categories = rollups['by_category']
     
     # Create PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=18)
+    doc = SimpleDocTemplate(out, pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=18)
     
     elements = []
     styles = getSampleStyleSheet()
@@ -3268,9 +2886,123 @@ def export_cost_analytics_pdf():
     
     # Build PDF
     doc.build(elements)
+
+@app.route('/api/cache-stats')
+def cache_stats():
+    """Hit/miss counters for this worker's in-process caches (managers only)"""
+    if session.get('user_type') != 'manager':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    return jsonify({
+        'holders': holder_cache.stats(),
+        'cost_reports': report_cache.stats(),
+        'reference_data': reference_data.stats(),
+        'markdown': markdown_cache.stats(),
+        'search': search_index.stats()
+    })
+
+@app.route('/api/db-pool-stats')
+def db_pool_stats():
+    """Connection pool usage for this worker process (managers only)"""
+    if session.get('user_type') != 'manager':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
     
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name=f'cost_analytics_{datetime.now().strftime("%Y-%m-%d")}.pdf', mimetype='application/pdf')
+    return jsonify(pool_stats())
+
+
+# ==================== SEARCH ====================
+
+SEARCH_MAX_PER_PAGE = 100
+
+@app.route('/api/search')
+def api_search():
+    """Ranked, paginated search over state pages and licenses (?q=&page=&per_page=)"""
+    query = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), SEARCH_MAX_PER_PAGE)
+    is_manager = session.get('user_type') == 'manager'
+    
+    # License holders only see their own licenses; everyone sees state pages
+    holder_id = None
+    if not is_manager:
+        db = SessionLocal()
+        try:
+            holder_id = verified_holder_id(db, get_allowed_account())
+        finally:
+            db.close()
+    
+    started = time.perf_counter()
+    total, matches = search_index.search(query, holder_id=holder_id, all_licenses=is_manager, page=page, per_page=per_page)
+    
+    results = []
+    for score, document in matches:
+        result = {
+            'type': document['type'],
+            'id': document['id'],
+            'title': document['title'],
+            'subtitle': document['subtitle'],
+            'score': round(score, 3)
+        }
+        if document['type'] == 'license':
+            result['expires_on'] = document['expires_on']
+            result['url'] = f"/team/view/{document['employee_id']}" if is_manager else f"/settings/edit-license/{document['id']}"
+        else:
+            result['url'] = document['url']
+        results.append(result)
+    
+    return jsonify({
+        'query': query,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+
+# ==================== BACKGROUND JOB ROUTES ====================
+
+def get_visible_job(job_id):
+    """Job record if the current user may see it (their own, or any for managers), else 404"""
+    job = get_job(job_id)
+    if job is None:
+        abort(404)
+    if session.get('user_type') != 'manager' and job['owner'] != session.get('user_id'):
+        abort(404)
+    return job
+
+@app.route('/jobs/<job_id>')
+def job_status_api(job_id):
+    """Job status as JSON, for polling"""
+    return jsonify(job_status(get_visible_job(job_id)))
+
+@app.route('/jobs/<job_id>/wait')
+def job_wait(job_id):
+    """Page that polls a job and moves on to its result when it finishes"""
+    job = get_visible_job(job_id)
+    return render_template('job_wait.html', job=job_status(job))
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    """Download a finished job's result file"""
+    job = get_visible_job(job_id)
+    if job['status'] != 'done' or not job['result_file'] or not os.path.exists(job['result_file']):
+        return "Result not available", 404
+    return send_file(job['result_file'], as_attachment=True, download_name=job['result_name'], mimetype=job['result_mimetype'])
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Result page for a finished CSV import job"""
+    job = get_visible_job(job_id)
+    if job['status'] == 'failed':
+        return job['message'] or "Job failed", 500
+    if job['status'] != 'done' or job['kind'] != 'csv_import':
+        return redirect(f'/jobs/{job_id}/wait')
+    
+    data = job['data']
+    if data['multi_holder']:
+        return render_multi_holder_import_report(data['report'])
+    return render_import_success(data['license_holder'], data['created'], data['updated'])
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,251 @@
+"""
+COPY-based bulk loader for historical backfills
+Stages CSV rows into a temp table with COPY FROM STDIN, then merges them
+into rs_licenses / rs_license_costs with a single INSERT ... SELECT
+
+Usage:
+    python bulk_loader.py costs accounting_export.csv
+    python bulk_loader.py licenses licenses.csv
+
+Cost CSV columns: license_id, date, category, amount[, vendor, notes, receipt_url]
+License CSV columns: license_id, holder (employee_id or pin), jurisdiction,
+jurisdiction_abbr, license_type[, jurisdiction_type, license_number, status,
+issued_on, expires_on, board_name, board_phone, board_email, board_url,
+designated_role, renewal_period_years, renewal_fee]
+
+Column order in the file is free; the header row names the columns.
+"""
+import csv
+import sys
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models import engine
+from holder_cache import holder_cache
+from report_cache import report_cache
+from team_aggregates import refresh_team_rollup
+
+COST_STAGE_COLUMNS = {
+    'license_id': 'TEXT',
+    'date': 'DATE',
+    'category': 'TEXT',
+    'amount': 'NUMERIC(10,2)',
+    'vendor': 'TEXT',
+    'notes': 'TEXT',
+    'receipt_url': 'TEXT'
+}
+COST_REQUIRED = ('license_id', 'date', 'category', 'amount')
+
+LICENSE_STAGE_COLUMNS = {
+    'license_id': 'TEXT',
+    'holder': 'TEXT',
+    'jurisdiction': 'TEXT',
+    'jurisdiction_abbr': 'TEXT',
+    'jurisdiction_type': 'TEXT',
+    'license_type': 'TEXT',
+    'license_number': 'TEXT',
+    'status': 'TEXT',
+    'issued_on': 'DATE',
+    'expires_on': 'DATE',
+    'board_name': 'TEXT',
+    'board_phone': 'TEXT',
+    'board_email': 'TEXT',
+    'board_url': 'TEXT',
+    'designated_role': 'TEXT',
+    'renewal_period_years': 'INTEGER',
+    'renewal_fee': 'NUMERIC(10,2)'
+}
+LICENSE_REQUIRED = ('license_id', 'holder', 'jurisdiction', 'jurisdiction_abbr', 'license_type')
+
+# A stage row identical to a cost line already on the license (same date,
+# category, amount, vendor and notes) is skipped, so re-running a file adds
+# nothing. Identical rows within one file are all kept.
+MERGE_COSTS = """
+    INSERT INTO rs_license_costs (license_id, date, category, amount, vendor, notes, receipt_url)
+    SELECT l.id, s.date, s.category, s.amount, s.vendor, s.notes, s.receipt_url
+    FROM rs_cost_stage s
+    JOIN rs_licenses l ON l.license_id = s.license_id
+    WHERE s.date IS NOT NULL AND s.category IS NOT NULL AND s.amount IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM rs_license_costs c
+          WHERE c.license_id = l.id
+            AND c.date = s.date
+            AND c.category = s.category
+            AND c.amount = s.amount
+            AND c.vendor IS NOT DISTINCT FROM s.vendor
+            AND c.notes IS NOT DISTINCT FROM s.notes
+      )
+"""
+
+# Last row wins when a license_id repeats; never re-parent another holder's license
+MERGE_LICENSES = """
+    INSERT INTO rs_licenses (
+        holder_id, license_id, jurisdiction, jurisdiction_abbr, jurisdiction_type,
+        license_type, license_number, status, issued_on, expires_on, board_name,
+        board_phone, board_email, board_url, designated_role, renewal_period_years, renewal_fee
+    )
+    SELECT DISTINCT ON (s.license_id)
+        h.id, s.license_id, s.jurisdiction, UPPER(s.jurisdiction_abbr),
+        COALESCE(s.jurisdiction_type, 'state'), s.license_type, s.license_number,
+        COALESCE(s.status, 'not_licensed'), s.issued_on, s.expires_on, s.board_name,
+        LEFT(s.board_phone, 20), s.board_email, s.board_url, s.designated_role,
+        COALESCE(s.renewal_period_years, 2), s.renewal_fee
+    FROM rs_license_stage s
+    JOIN rs_license_holders h ON h.employee_id = s.holder OR h.pin = s.holder
+    ORDER BY s.license_id, s.row_no DESC
+    ON CONFLICT (license_id) DO UPDATE SET
+        jurisdiction = EXCLUDED.jurisdiction,
+        jurisdiction_abbr = EXCLUDED.jurisdiction_abbr,
+        jurisdiction_type = EXCLUDED.jurisdiction_type,
+        license_type = EXCLUDED.license_type,
+        license_number = COALESCE(EXCLUDED.license_number, rs_licenses.license_number),
+        status = EXCLUDED.status,
+        issued_on = COALESCE(EXCLUDED.issued_on, rs_licenses.issued_on),
+        expires_on = COALESCE(EXCLUDED.expires_on, rs_licenses.expires_on),
+        board_name = COALESCE(EXCLUDED.board_name, rs_licenses.board_name),
+        board_phone = COALESCE(EXCLUDED.board_phone, rs_licenses.board_phone),
+        board_email = COALESCE(EXCLUDED.board_email, rs_licenses.board_email),
+        board_url = COALESCE(EXCLUDED.board_url, rs_licenses.board_url),
+        designated_role = COALESCE(EXCLUDED.designated_role, rs_licenses.designated_role),
+        renewal_period_years = EXCLUDED.renewal_period_years,
+        renewal_fee = COALESCE(EXCLUDED.renewal_fee, rs_licenses.renewal_fee)
+    WHERE rs_licenses.holder_id = EXCLUDED.holder_id
+"""
+
+
+def _stage(conn, stage_table, stage_columns, required, csv_stream):
+    """
+    Create a temp stage table and COPY the CSV body into it
+
+    The header row is read here to name the COPY columns, so files can carry
+    any subset of stage columns in any order. Returns the staged row count.
+    """
+    header = [column.strip() for column in next(csv.reader([csv_stream.readline()]), [])]
+
+    unknown = [column for column in header if column not in stage_columns]
+    missing = [column for column in required if column not in header]
+    if unknown or missing:
+        raise ValueError(f"Bad CSV header (unknown: {unknown}, missing: {missing})")
+
+    columns_sql = ', '.join(f'{name} {sql_type}' for name, sql_type in stage_columns.items())
+    conn.execute(text(f'CREATE TEMP TABLE {stage_table} (row_no BIGSERIAL, {columns_sql}) ON COMMIT DROP'))
+
+    # psycopg2 cursor on the same connection/transaction as the merge
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {stage_table} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)",
+            csv_stream
+        )
+    finally:
+        cursor.close()
+
+    return conn.execute(text(f'SELECT COUNT(*) FROM {stage_table}')).scalar()
+
+
+def _refresh_rollups(conn, holder_ids):
+    """Refresh team rollups for the holders a load touched, in the load's transaction"""
+    db = Session(bind=conn)
+    try:
+        for holder_id in holder_ids:
+            refresh_team_rollup(db, holder_id)
+        db.flush()
+    finally:
+        db.close()
+
+
+def _report(staged, merged, started):
+    seconds = time.perf_counter() - started
+    return {
+        'rows_staged': staged,
+        'rows_merged': merged,
+        'rows_skipped': staged - merged,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(staged / seconds) if seconds > 0 else staged
+    }
+
+
+def load_costs(csv_stream):
+    """
+    Bulk-load cost lines from a CSV stream into rs_license_costs
+
+    Rows whose license_id doesn't exist, that lack date/category/amount, or
+    that duplicate a cost line already stored for the license (same date,
+    category, amount, vendor and notes) are skipped, so loading the same
+    file twice is safe. Everything runs in one transaction. Returns a report dict
+    with staged/merged/skipped counts, elapsed seconds and rows_per_sec.
+    """
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        staged = _stage(conn, 'rs_cost_stage', COST_STAGE_COLUMNS, COST_REQUIRED, csv_stream)
+        merged = conn.execute(text(MERGE_COSTS)).rowcount
+
+        holder_ids = [row[0] for row in conn.execute(text(
+            'SELECT DISTINCT l.holder_id FROM rs_cost_stage s JOIN rs_licenses l ON l.license_id = s.license_id'
+        ))]
+        _refresh_rollups(conn, holder_ids)
+
+    holder_cache.clear()
+    report_cache.clear()
+    return _report(staged, merged, started)
+
+
+def load_licenses(csv_stream):
+    """
+    Bulk-load licenses from a CSV stream into rs_licenses (insert or update by license_id)
+
+    Rows for unknown holders, or whose license_id belongs to a different
+    holder, are skipped. Holder license totals and team rollups are
+    refreshed in the same transaction. Returns the same report as load_costs.
+    """
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        staged = _stage(conn, 'rs_license_stage', LICENSE_STAGE_COLUMNS, LICENSE_REQUIRED, csv_stream)
+        merged = conn.execute(text(MERGE_LICENSES)).rowcount
+
+        holder_ids = [row[0] for row in conn.execute(text(
+            'SELECT DISTINCT h.id FROM rs_license_stage s '
+            'JOIN rs_license_holders h ON h.employee_id = s.holder OR h.pin = s.holder'
+        ))]
+        conn.execute(text(
+            'UPDATE rs_license_holders h SET total_licenses = '
+            '(SELECT COUNT(*) FROM rs_licenses l WHERE l.holder_id = h.id) '
+            'WHERE h.id = ANY(:holder_ids)'
+        ), {'holder_ids': holder_ids})
+        _refresh_rollups(conn, holder_ids)
+
+    holder_cache.clear()
+    report_cache.clear()
+    return _report(staged, merged, started)
+
+
+LOADERS = {
+    'costs': load_costs,
+    'licenses': load_licenses
+}
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in LOADERS:
+        print(f"Usage: python {sys.argv[0]} [costs|licenses] <file.csv>")
+        sys.exit(2)
+
+    kind, path = sys.argv[1], sys.argv[2]
+    print(f"📥 Loading {kind} from {path}")
+
+    try:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            report = LOADERS[kind](f)
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+
+    print(f"✅ Merged {report['rows_merged']:,} of {report['rows_staged']:,} rows "
+          f"({report['rows_skipped']:,} skipped) in {report['seconds']}s "
+          f"- {report['rows_per_sec']:,} rows/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Cost rollups computed in SQL
+SUM(amount) over rs_license_costs grouped by year, category, holder and
+license, so reports get totals without loading every cost row
+
+The only engine behind the cost analytics page and its PDF export, so both
+report the same numbers.
+"""
+from sqlalchemy import func, distinct
+from models import SessionLocal, RSLicense, RSLicenseCost
+from holder_identity import verified_holder_id
+
+
+def _for_holder(query, holder):
+    """Restrict a cost query (joined to RSLicense) to one holder's licenses"""
+    if holder is None:
+        return query
+    return query.filter(RSLicense.holder_id == verified_holder_id(query.session, holder))
+
+
+def cost_rollups(holder=None):
+    """
+    Actual-cost rollups for the whole team, or one holder (employee_id or pin)
+
+    Returns total, by_year (most recent first, each with total_spent,
+    license_count and a categories split), by_category ({category: amount},
+    largest first) and by_holder ({holder_id: amount}).
+    """
+    db = SessionLocal()
+    try:
+        year = func.extract('year', RSLicenseCost.date)
+
+        rows = _for_holder(db.query(
+            year.label('year'),
+            RSLicenseCost.category,
+            RSLicense.holder_id,
+            func.sum(RSLicenseCost.amount).label('amount')
+        ).join(RSLicense, RSLicenseCost.license_id == RSLicense.id), holder).group_by(
+            year, RSLicenseCost.category, RSLicense.holder_id
+        ).order_by(
+            func.sum(RSLicenseCost.amount).desc()
+        ).all()
+
+        license_counts = dict(_for_holder(db.query(
+            year.label('year'),
+            func.count(distinct(RSLicenseCost.license_id))
+        ).join(RSLicense, RSLicenseCost.license_id == RSLicense.id), holder).group_by(year).all())
+
+        total = 0
+        years = {}
+        categories = {}
+        by_holder = {}
+
+        for row in rows:
+            amount = float(row.amount or 0)
+            row_year = int(row.year)
+            total += amount
+
+            if row_year not in years:
+                years[row_year] = {
+                    'year': row_year,
+                    'total_spent': 0,
+                    'license_count': int(license_counts.get(row.year, 0)),
+                    'categories': {}
+                }
+            year_data = years[row_year]
+            year_data['total_spent'] += amount
+            year_data['categories'][row.category] = year_data['categories'].get(row.category, 0) + amount
+
+            categories[row.category] = categories.get(row.category, 0) + amount
+            by_holder[row.holder_id] = by_holder.get(row.holder_id, 0) + amount
+
+        return {
+            'total': total,
+            'by_year': sorted(years.values(), key=lambda x: x['year'], reverse=True),
+            'by_category': dict(sorted(categories.items(), key=lambda x: x[1], reverse=True)),
+            'by_holder': by_holder
+        }
+
+    finally:
+        db.close()
+
+
+def license_cost_totals(holder=None):
+    """Actual spend per license as {license_id: amount}"""
+    db = SessionLocal()
+    try:
+        rows = _for_holder(db.query(
+            RSLicense.license_id,
+            func.sum(RSLicenseCost.amount)
+        ).join(RSLicense, RSLicenseCost.license_id == RSLicense.id), holder).group_by(
+            RSLicense.license_id
+        ).all()
+
+        return {license_id: float(amount or 0) for license_id, amount in rows}
+
+    finally:
+        db.close()
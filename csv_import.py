@@ -0,0 +1,375 @@
+"""
+Streaming CSV license import
+Parses the uploaded CSV row by row and writes licenses and budgets in
+batches with INSERT ... ON CONFLICT upserts
+
+Existing licenses are matched on (jurisdiction_abbr, license_type) through
+an in-memory index built with one query, so matching is O(1) per row and
+memory stays bounded by the batch size rather than the file size.
+
+Files with a Holder column can be imported for many holders at once:
+rows are partitioned per holder and each partition is imported by a
+bounded thread pool, one DB session per worker.
+"""
+import csv
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import func, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import SessionLocal, RSLicense, RSLicenseBudget
+from holder_cache import invalidate_holder
+from holder_identity import get_holder
+from report_cache import invalidate_cost_report
+from team_aggregates import refresh_team_rollup
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '4'))  # Concurrent holders in a multi-holder import
+
+# State name to abbreviation mapping
+STATE_ABBREVIATIONS = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR',
+    'california': 'CA', 'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE',
+    'florida': 'FL', 'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID',
+    'illinois': 'IL', 'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS',
+    'kentucky': 'KY', 'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
+    'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN', 'mississippi': 'MS',
+    'missouri': 'MO', 'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV',
+    'new hampshire': 'NH', 'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY',
+    'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH', 'oklahoma': 'OK',
+    'oregon': 'OR', 'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC',
+    'south dakota': 'SD', 'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT',
+    'vermont': 'VT', 'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV',
+    'wisconsin': 'WI', 'wyoming': 'WY'
+}
+
+# CSV column -> rs_license_budgets column
+BUDGET_COLUMNS = {
+    'Application Fees': 'application_fee',
+    'Test Fees': 'test_fee',
+    'Trade Book fees': 'trade_book_fee',
+    'Bus. & Law Book Fee': 'business_law_book_fee',
+    'Lic. Activation Fee': 'activation_fee',
+    'Prep Course fees': 'prep_course_fee',
+    'Travel Fees': 'travel_estimate',
+    'Shipping Fees': 'shipping_estimate',
+    'Renewal Fees': 'renewal_fee',
+    'Cont. Ed. Fees': 'continuing_ed_fee'
+}
+
+# License columns that only fill blanks on existing licenses
+DETAIL_COLUMNS = (
+    'license_number', 'issued_on', 'expires_on', 'designated_role',
+    'board_name', 'board_phone', 'board_url'
+)
+
+
+def clean_currency(value):
+    """Remove $, commas and convert to Decimal"""
+    if not value or str(value).strip() == '':
+        return Decimal('0')
+    cleaned = re.sub(r'[\$,\s]', '', str(value))
+    try:
+        return Decimal(cleaned)
+    except ArithmeticError:
+        return Decimal('0')
+
+
+def parse_renewal_period(value):
+    """Extract years from renewal period"""
+    if not value:
+        return 2
+    match = re.search(r'(\d+)', str(value))
+    return int(match.group(1)) if match else 2
+
+
+def parse_date(value):
+    """YYYY-MM-DD (or M/D/YYYY) to a date, or None"""
+    value = (value or '').strip()
+    for fmt in ('%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def state_abbreviation(state_raw):
+    """Two-letter abbreviation for a state name or abbreviation"""
+    if len(state_raw) == 2:
+        return state_raw.upper()
+    return STATE_ABBREVIATIONS.get(state_raw.lower(), state_raw[:2].upper())
+
+
+def read_license_rows(text_stream):
+    """
+    Yield one parsed license row per CSV line, without reading the whole file
+
+    Rows without a State are skipped. Each row has the license columns
+    (jurisdiction, jurisdiction_abbr, license_type, status, details,
+    renewal settings), 'budget' with the rs_license_budgets columns and
+    'holder' (the Holder column, or None).
+    """
+    for row in csv.DictReader(text_stream):
+        state_raw = (row.get('State') or '').strip()
+        if not state_raw:
+            continue
+
+        abbr = state_abbreviation(state_raw)
+
+        yield {
+            'jurisdiction': state_raw if len(state_raw) > 2 else abbr,
+            'jurisdiction_abbr': abbr,
+            'license_type': (row.get('License Type') or '').strip() or 'Master Plumber',
+            'status': (row.get('Status') or '').strip() or 'not_licensed',
+            'license_number': (row.get('License Number') or '').strip() or None,
+            'issued_on': parse_date(row.get('Issue Date')),
+            'expires_on': parse_date(row.get('Expiration Date')),
+            'designated_role': (row.get('Designated Role') or '').strip() or None,
+            'board_name': (row.get('Board Name') or '').strip() or None,
+            'board_phone': (row.get('Board Phone') or '').strip()[:20] or None,
+            'board_url': (row.get('Board URL') or '').strip() or None,
+            'renewal_fee': clean_currency(row.get('Renewal Fees')),
+            'renewal_period_years': parse_renewal_period(row.get('Renewal Period')),
+            'budget': {column: clean_currency(row.get(header)) for header, column in BUDGET_COLUMNS.items()},
+            'holder': (row.get('Holder') or '').strip() or None
+        }
+
+
+class LicenseIdAllocator:
+    """
+    Hands out unused '<ABBR>-<NNN>' license ids
+
+    license_id is unique across all holders, so concurrent imports share one
+    allocator (seeded with every id in use) instead of each guessing.
+    """
+
+    def __init__(self, taken_ids):
+        self._taken = set(taken_ids)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_db(cls, db):
+        return cls(license_id for (license_id,) in db.query(RSLicense.license_id))
+
+    def allocate(self, abbr, number):
+        """First free id for abbr at or after number"""
+        with self._lock:
+            license_id = f"{abbr}-{number:03d}"
+            while license_id in self._taken:
+                number += 1
+                license_id = f"{abbr}-{number:03d}"
+            self._taken.add(license_id)
+            return license_id
+
+
+def _license_upsert(overwrite):
+    """
+    INSERT ... ON CONFLICT (license_id) for license rows
+
+    Executed with a list of rows, so SQLAlchemy batches them into multi-row
+    INSERTs while compiling (and caching) the statement only once.
+    """
+    stmt = pg_insert(RSLicense)
+    excluded = stmt.excluded
+
+    def fee(column):
+        current = getattr(RSLicense, column)
+        if overwrite:
+            return getattr(excluded, column)
+        return case((func.coalesce(current, 0) == 0, getattr(excluded, column)), else_=current)
+
+    update = {column: func.coalesce(getattr(RSLicense, column), getattr(excluded, column)) for column in DETAIL_COLUMNS}
+    update['renewal_fee'] = fee('renewal_fee')
+    update['renewal_period_years'] = excluded.renewal_period_years if overwrite else func.coalesce(
+        RSLicense.renewal_period_years, excluded.renewal_period_years)
+    update['updated_at'] = func.now()
+
+    # Never let an import touch another holder's license
+    return stmt.on_conflict_do_update(
+        index_elements=[RSLicense.license_id],
+        set_=update,
+        where=(RSLicense.holder_id == excluded.holder_id)
+    ).returning(RSLicense.id, RSLicense.license_id)
+
+
+def _budget_upsert(overwrite):
+    """INSERT ... ON CONFLICT (license_id) for budget rows"""
+    stmt = pg_insert(RSLicenseBudget)
+    excluded = stmt.excluded
+
+    update = {}
+    for column in BUDGET_COLUMNS.values():
+        current = getattr(RSLicenseBudget, column)
+        if overwrite:
+            update[column] = getattr(excluded, column)
+        else:
+            update[column] = case((func.coalesce(current, 0) == 0, getattr(excluded, column)), else_=current)
+    update['updated_at'] = func.now()
+
+    return stmt.on_conflict_do_update(index_elements=[RSLicenseBudget.license_id], set_=update)
+
+
+def import_license_rows(account, rows, overwrite=False, batch_size=IMPORT_BATCH_SIZE, id_allocator=None):
+    """
+    Upsert parsed CSV rows (see read_license_rows) for one license holder
+
+    Rows are matched to the holder's licenses on (jurisdiction_abbr,
+    license_type); unmatched rows create licenses with the usual
+    '<ABBR>-<NNN>' ids. Without overwrite, fees only fill zero/blank values.
+    Everything commits in one transaction.
+
+    Returns (True, {'rows', 'created', 'updated', 'skipped'}) or (False, error).
+    """
+    db = SessionLocal()
+    try:
+        holder = get_holder(db, account)
+
+        if not holder:
+            return False, "Holder not found"
+
+        # (abbr, license_type) -> license_id for this holder, plus every id in use
+        index = {
+            (abbr, license_type): license_id
+            for abbr, license_type, license_id in db.query(
+                RSLicense.jurisdiction_abbr, RSLicense.license_type, RSLicense.license_id
+            ).filter(RSLicense.holder_id == holder.id)
+        }
+        id_allocator = id_allocator or LicenseIdAllocator.from_db(db)
+        next_number = len(index) + 1
+
+        license_upsert = _license_upsert(overwrite)
+        budget_upsert = _budget_upsert(overwrite)
+        stats = {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+        pending = {}  # license_id -> (license row, budget row, 'created' or 'updated')
+
+        def flush():
+            if not pending:
+                return
+            license_rows = [license_row for license_row, _, _ in pending.values()]
+            ids = dict((license_id, row_id) for row_id, license_id in
+                       db.execute(license_upsert, license_rows).all())
+
+            budget_rows = []
+            for license_id, (_, budget_row, outcome) in pending.items():
+                if license_id in ids:
+                    budget_rows.append(dict(budget_row, license_id=ids[license_id]))
+                else:
+                    # Belongs to another holder; nothing was written for this row
+                    stats[outcome] -= 1
+                    stats['skipped'] += 1
+            if budget_rows:
+                db.execute(budget_upsert, budget_rows)
+            pending.clear()
+
+        for row in rows:
+            stats['rows'] += 1
+            key = (row['jurisdiction_abbr'], row['license_type'])
+            license_id = index.get(key)
+
+            if license_id is None:
+                license_id = id_allocator.allocate(row['jurisdiction_abbr'], next_number)
+                next_number += 1
+                index[key] = license_id
+                outcome = 'created'
+            else:
+                outcome = 'updated'
+            stats[outcome] += 1
+
+            # A statement can't upsert the same row twice
+            if license_id in pending:
+                flush()
+
+            budget_row = row['budget']
+            license_row = {column: value for column, value in row.items() if column not in ('budget', 'holder')}
+            license_row.update(holder_id=holder.id, license_id=license_id, jurisdiction_type='state')
+            pending[license_id] = (license_row, budget_row, outcome)
+
+            if len(pending) >= batch_size:
+                flush()
+
+        flush()
+
+        holder.total_licenses = db.query(RSLicense).filter_by(holder_id=holder.id).count()
+        refresh_team_rollup(db, holder.id)
+
+        db.commit()
+        invalidate_holder(account)
+        invalidate_cost_report(account)
+        return True, stats
+
+    except Exception as e:
+        db.rollback()
+        print(f"ERROR importing CSV: {e}")
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def import_multi_holder_rows(rows, overwrite=False, max_workers=IMPORT_WORKERS):
+    """
+    Import rows for many holders, routed by each row's 'holder' (Holder column)
+
+    Each Holder value (employee_id or PIN) is resolved to its holder once and
+    rows are partitioned per holder id, so one holder listed both ways is
+    still a single partition. Each partition runs through
+    import_license_rows on a bounded thread pool (each call opens its own
+    session and commits on its own, so one bad holder doesn't roll back the
+    rest). Returns a consolidated report keyed by the holder's employee_id
+    (or PIN): {'holders': {holder: stats}, 'failed': {holder: error},
+    'totals': {...}, 'rows_without_holder': n}
+    """
+    report = {
+        'holders': {},
+        'failed': {},
+        'totals': {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0},
+        'rows_without_holder': 0
+    }
+    partitions = {}  # holder id -> (account, rows)
+    resolved = {}  # Holder value -> holder id, or None if unknown
+
+    db = SessionLocal()
+    try:
+        for row in rows:
+            value = row.get('holder')
+            if not value:
+                report['rows_without_holder'] += 1
+                continue
+
+            if value not in resolved:
+                holder = get_holder(db, value)
+                resolved[value] = holder.id if holder else None
+                if holder and holder.id not in partitions:
+                    partitions[holder.id] = (holder.employee_id or holder.pin, [])
+
+            if resolved[value] is None:
+                report['failed'][value] = "Holder not found"
+                continue
+            partitions[resolved[value]][1].append(row)
+
+        id_allocator = LicenseIdAllocator.from_db(db)
+    finally:
+        db.close()
+
+    if not partitions:
+        return report
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(partitions)))) as pool:
+        futures = {
+            account: pool.submit(import_license_rows, account, holder_rows, overwrite, IMPORT_BATCH_SIZE, id_allocator)
+            for account, holder_rows in partitions.values()
+        }
+
+        for holder, future in futures.items():
+            success, result = future.result()
+            if not success:
+                report['failed'][holder] = result
+                continue
+            report['holders'][holder] = result
+            for key in report['totals']:
+                report['totals'][key] += result[key]
+
+    return report
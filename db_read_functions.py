@@ -0,0 +1,411 @@
+"""
+Database READ helper functions
+Loads license holders into the dict format the templates expect
+"""
+import threading
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import Date, bindparam, event, func
+from sqlalchemy.orm import selectinload
+from models import (
+    engine, SessionLocal, RSLicenseHolder, RSLicense, RSCompanyCoverage
+)
+from holder_cache import holder_cache
+from holder_identity import resolve_holder_id, verified_holder_id, forget_holder_identity
+from cost_aggregates import license_cost_totals
+
+
+@contextmanager
+def count_queries():
+    """
+    Count SQL statements issued by the current thread while the block runs.
+
+    Usage:
+        with count_queries() as counter:
+            load_license_holder_data('bhambrick')
+        assert counter['count'] <= 5
+    """
+    counter = {'count': 0, 'statements': []}
+    thread_id = threading.get_ident()
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread_id:
+            counter['count'] += 1
+            counter['statements'].append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
+
+
+def holder_eager_options(include_costs=True):
+    """
+    Loader options that fetch a holder's licenses, costs, budgets and bio
+    with one SELECT ... IN per relationship instead of one per row
+    """
+    options = (
+        selectinload(RSLicenseHolder.licenses).selectinload(RSLicense.budget),
+        selectinload(RSLicenseHolder.bio_data),
+    )
+    if include_costs:
+        options += (selectinload(RSLicenseHolder.licenses).selectinload(RSLicense.costs),)
+    return options
+
+
+def license_to_dict(lic, actual_spent=None):
+    """
+    Convert an RSLicense (with costs and budget loaded) to the JSON license format
+
+    Pass actual_spent (e.g. from cost_aggregates.license_cost_totals) to skip
+    the cost lines: the dict then has no 'actual_costs' and carries that total.
+    """
+    license_dict = {
+        'license_id': lic.license_id,
+        'jurisdiction': lic.jurisdiction,
+        'jurisdiction_abbr': lic.jurisdiction_abbr,
+        'jurisdiction_type': lic.jurisdiction_type,
+        'license_type': lic.license_type,
+        'license_number': lic.license_number,
+        'status': lic.status,
+        'issued_on': lic.issued_on.isoformat() if lic.issued_on else None,
+        'expires_on': lic.expires_on.isoformat() if lic.expires_on else None,
+        'board_name': lic.board_name,
+        'board_phone': lic.board_phone,
+        'board_email': lic.board_email,
+        'board_url': lic.board_url,
+        'designated_role': lic.designated_role,
+        'recurring': {
+            'renewal_period_years': lic.renewal_period_years,
+            'renewal_fee': float(lic.renewal_fee) if lic.renewal_fee else 0
+        },
+        'actual_costs': [],
+        'estimated_costs': {},
+        'cost_totals': {
+            'initial_estimated': 0,
+            'actual_spent': 0,
+            'variance': 0,
+            'recurring_cost': 0
+        }
+    }
+
+    # Add actual costs (or just their pre-summed total)
+    if actual_spent is None:
+        for cost in lic.costs:
+            license_dict['actual_costs'].append({
+                'date': cost.date.isoformat() if cost.date else None,
+                'category': cost.category,
+                'amount': float(cost.amount),
+                'vendor': cost.vendor,
+                'notes': cost.notes
+            })
+    else:
+        del license_dict['actual_costs']
+        license_dict['cost_totals']['actual_spent'] = actual_spent
+
+    # Add budget (estimated costs)
+    if lic.budget:
+        budget = lic.budget
+        license_dict['estimated_costs'] = {
+            'application_fee': float(budget.application_fee or 0),
+            'test_fee': float(budget.test_fee or 0),
+            'trade_book_fee': float(budget.trade_book_fee or 0),
+            'business_law_book_fee': float(budget.business_law_book_fee or 0),
+            'activation_fee': float(budget.activation_fee or 0),
+            'prep_course_fee': float(budget.prep_course_fee or 0),
+            'travel': float(budget.travel_estimate or 0),
+            'shipping': float(budget.shipping_estimate or 0),
+            'renewal_fee': float(budget.renewal_fee or 0),
+            'continuing_ed_fee': float(budget.continuing_ed_fee or 0)
+        }
+
+        # Calculate totals
+        initial_estimated = sum([
+            float(budget.application_fee or 0),
+            float(budget.test_fee or 0),
+            float(budget.trade_book_fee or 0),
+            float(budget.business_law_book_fee or 0),
+            float(budget.activation_fee or 0),
+            float(budget.prep_course_fee or 0),
+            float(budget.travel_estimate or 0),
+            float(budget.shipping_estimate or 0)
+        ])
+
+        if actual_spent is None:
+            actual_spent = sum(c['amount'] for c in license_dict['actual_costs'])
+        recurring_cost = float(budget.renewal_fee or 0) + float(budget.continuing_ed_fee or 0)
+
+        license_dict['cost_totals'] = {
+            'initial_estimated': initial_estimated,
+            'actual_spent': actual_spent,
+            'variance': actual_spent - initial_estimated,
+            'recurring_cost': recurring_cost
+        }
+
+        license_dict['planning'] = {
+            'est_study_hours': 0,
+            'test_duration_hours': 0
+        }
+
+    return license_dict
+
+
+def holder_to_dict(holder, cost_totals=None):
+    """
+    Convert an RSLicenseHolder to the dictionary format (same as old JSON structure)
+
+    With cost_totals ({license_id: amount}) licenses carry SQL-summed spend
+    instead of their cost lines (see license_to_dict).
+    """
+    holder_data = {
+        'user_id': holder.employee_id or holder.pin,
+        'name': holder.full_name,
+        'role': holder.role,
+        'total_licenses': holder.total_licenses,
+        'total_certificates': holder.total_certificates,
+        'next_target_state': holder.next_target_state,
+        'pin': holder.pin,
+        'licenses': [
+            license_to_dict(lic) if cost_totals is None
+            else license_to_dict(lic, cost_totals.get(lic.license_id, 0))
+            for lic in holder.licenses
+        ]
+    }
+
+    # Add bio data if exists
+    if holder.bio_data:
+        bio = holder.bio_data
+        holder_data['bio'] = {
+            'personal_info': bio.personal_info,
+            'addresses': bio.addresses,
+            'work_history': bio.work_history,
+            'plumbing_experience': bio.plumbing_experience,
+            'job_projects': bio.job_projects,
+            'education': bio.education,
+            'references': bio.professional_references,
+            'background': bio.background,
+            'military': bio.military
+        }
+
+    return holder_data
+
+
+def load_license_holder_data(user_id='bhambrick', eager=True, use_cache=True):
+    """
+    Load data for a specific license holder from database
+
+    With eager=True (the default) the holder is loaded in a fixed number of
+    queries (holder, licenses, costs, budgets, bio) regardless of how many
+    licenses or cost lines it has. eager=False keeps the old lazy-loading
+    behavior, which issues a query per relationship per license.
+
+    Snapshots are served from holder_cache when fresh; pass use_cache=False
+    to always hit the database.
+    """
+    if use_cache:
+        cached = holder_cache.get(user_id)
+        if cached is not None:
+            return cached
+        generation = holder_cache.generation()
+
+    db = SessionLocal()
+    try:
+        query = db.query(RSLicenseHolder)
+        if eager:
+            query = query.options(*holder_eager_options())
+
+        # employee_id or pin -> holder id, then load by primary key
+        holder_id = resolve_holder_id(db, user_id)
+        holder = query.filter(RSLicenseHolder.id == holder_id).first() if holder_id is not None else None
+
+        # The cached id may be stale if another worker changed an employee_id/pin
+        if holder_id is not None and (holder is None or user_id not in (holder.employee_id, holder.pin)):
+            forget_holder_identity(user_id)
+            holder_id = resolve_holder_id(db, user_id)
+            holder = query.filter(RSLicenseHolder.id == holder_id).first() if holder_id is not None else None
+
+        if not holder:
+            return None
+
+        holder_data = holder_to_dict(holder)
+        if use_cache:
+            holder_cache.set(user_id, holder_data, generation)
+        return holder_data
+
+    finally:
+        db.close()
+
+
+def holder_exists(account):
+    """Whether a license holder with this employee_id or pin exists"""
+    db = SessionLocal()
+    try:
+        return verified_holder_id(db, account) is not None
+
+    finally:
+        db.close()
+
+
+def load_all_holders(include_costs=True):
+    """
+    Load every license holder from database in one session
+
+    Returns a list of dicts in the same format as load_license_holder_data.
+    Uses the same eager-loading options, so the whole team loads in a fixed
+    number of set-based queries no matter the headcount or license count.
+
+    include_costs=False skips the cost lines entirely: each license's
+    actual_spent comes from one SUM ... GROUP BY query instead, for reports
+    that only need totals.
+    """
+    generation = holder_cache.generation()
+    cost_totals = None if include_costs else license_cost_totals()
+    db = SessionLocal()
+    try:
+        holders = db.query(RSLicenseHolder).options(
+            *holder_eager_options(include_costs)
+        ).order_by(RSLicenseHolder.full_name).all()
+
+        all_holders = [holder_to_dict(holder, cost_totals) for holder in holders]
+
+        # Warm the per-holder cache while we have fresh (complete) snapshots
+        for holder_data in (all_holders if include_costs else []):
+            holder_cache.set(holder_data['user_id'], holder_data, generation)
+
+        return all_holders
+
+    finally:
+        db.close()
+
+
+def _expiring_query(query, start=None, end=None, holder=None):
+    """
+    Apply an expires_on window (inclusive, either bound optional) and an
+    optional holder (employee_id or pin) to a query joined to the holder
+
+    Licenses without an expiration date never match. The range filter is
+    served by idx_rs_licenses_expires / idx_rs_licenses_holder_expires.
+    """
+    query = query.filter(RSLicense.expires_on.isnot(None))
+    if start is not None:
+        query = query.filter(RSLicense.expires_on >= start)
+    if end is not None:
+        query = query.filter(RSLicense.expires_on <= end)
+    if holder is not None:
+        query = query.filter(RSLicense.holder_id == verified_holder_id(query.session, holder))
+    return query
+
+
+def licenses_expiring_between(start=None, end=None, holder=None, limit=None, today=None):
+    """
+    Licenses expiring in [start, end], soonest first
+
+    Leave start as None to include overdue licenses. Returns light dicts
+    (no costs or budget) with holder name/user_id and days_remaining, so
+    callers don't have to load every holder to find renewals.
+
+    days_remaining is computed in the query from today (date.today() unless
+    given) passed as a bound parameter, never the database's CURRENT_DATE,
+    so it follows the same whole-day rule as app.enhance_licenses.
+    """
+    today = today or date.today()
+
+    db = SessionLocal()
+    try:
+        query = db.query(
+            RSLicense.license_id,
+            RSLicense.jurisdiction,
+            RSLicense.jurisdiction_abbr,
+            RSLicense.license_type,
+            RSLicense.status,
+            RSLicense.expires_on,
+            RSLicenseHolder.employee_id,
+            RSLicenseHolder.pin,
+            RSLicenseHolder.full_name,
+            (RSLicense.expires_on - bindparam('today', today, type_=Date)).label('days_remaining')
+        ).join(RSLicenseHolder, RSLicense.holder_id == RSLicenseHolder.id)
+
+        query = _expiring_query(query, start, end, holder).order_by(
+            RSLicense.expires_on, RSLicenseHolder.full_name, RSLicense.jurisdiction_abbr
+        )
+        if limit:
+            query = query.limit(limit)
+
+        return [{
+            'license_id': row.license_id,
+            'jurisdiction': row.jurisdiction,
+            'jurisdiction_abbr': row.jurisdiction_abbr,
+            'license_type': row.license_type,
+            'status': row.status,
+            'expires_on': row.expires_on.isoformat(),
+            'days_remaining': row.days_remaining,
+            'holder_name': row.full_name,
+            'holder_user_id': row.employee_id or row.pin
+        } for row in query.all()]
+
+    finally:
+        db.close()
+
+
+def count_licenses_expiring_between(start=None, end=None, holder=None):
+    """Number of licenses expiring in [start, end] (see licenses_expiring_between)"""
+    db = SessionLocal()
+    try:
+        query = db.query(func.count(RSLicense.id)).join(
+            RSLicenseHolder, RSLicense.holder_id == RSLicenseHolder.id
+        )
+        return _expiring_query(query, start, end, holder).scalar() or 0
+
+    finally:
+        db.close()
+
+
+def expiring_counts_by_holder(start=None, end=None):
+    """Licenses expiring in [start, end] per holder, keyed by user_id (employee_id or pin)"""
+    db = SessionLocal()
+    try:
+        query = db.query(
+            RSLicenseHolder.employee_id,
+            RSLicenseHolder.pin,
+            func.count(RSLicense.id).label('expiring_count')
+        ).join(RSLicenseHolder, RSLicense.holder_id == RSLicenseHolder.id)
+
+        rows = _expiring_query(query, start, end).group_by(
+            RSLicenseHolder.id, RSLicenseHolder.employee_id, RSLicenseHolder.pin
+        ).all()
+
+        return {row.employee_id or row.pin: int(row.expiring_count) for row in rows}
+
+    finally:
+        db.close()
+
+
+def load_company_data():
+    """Load company-wide coverage data from database"""
+    db = SessionLocal()
+    try:
+        coverage_records = db.query(RSCompanyCoverage).all()
+
+        company_data = {
+            'company_name': 'Repipe Specialists',
+            'covered_states': [],
+            'in_progress_states': [],
+            'target_states': []
+        }
+
+        for record in coverage_records:
+            if record.status == 'licensed':
+                company_data['covered_states'].append(record.state_code)
+            elif record.status == 'in_progress':
+                company_data['in_progress_states'].append(record.state_code)
+            elif record.status == 'target':
+                company_data['target_states'].append(record.state_code)
+
+        company_data['total_states_covered'] = len(company_data['covered_states'])
+        company_data['total_states_in_progress'] = len(company_data['in_progress_states'])
+
+        return company_data
+
+    finally:
+        db.close()
@@ -3,11 +3,11 @@ Database WRITE helper functions
 Handles all database saves/updates/deletes
 """
 from models import (
-    SessionLocal, RSLicenseHolder, RSLicense, RSLicenseCost,
-    RSLicenseBudget, RSCompanyCoverage, RSBioData
+    SessionLocal, RSLicenseHolder, RSCompanyCoverage, RSBioData
 )
-from decimal import Decimal
-from datetime import datetime
+from holder_cache import invalidate_holder
+from holder_identity import get_holder, forget_holder_identity
+from unit_of_work import HolderUnitOfWork
 
 def save_license_holder_data(account, holder_data):
     """
@@ -17,9 +17,7 @@ def save_license_holder_data(account, holder_data):
     db = SessionLocal()
     try:
         # Find existing holder or create new
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if holder:
             # Update existing
@@ -46,6 +44,7 @@ def save_license_holder_data(account, holder_data):
         # We don't sync all licenses here, just the holder metadata
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -58,323 +57,95 @@ def save_license_holder_data(account, holder_data):
 
 def add_license_to_db(account, license_data):
     """Add a new license to the database"""
-    db = SessionLocal()
     try:
-        # Find holder
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
-        
-        if not holder:
-            return False
-        
-        # Create license
-        new_license = RSLicense(
-            holder_id=holder.id,
-            license_id=license_data['license_id'],
-            jurisdiction=license_data['jurisdiction'],
-            jurisdiction_abbr=license_data['jurisdiction_abbr'],
-            jurisdiction_type=license_data['jurisdiction_type'],
-            license_type=license_data['license_type'],
-            license_number=license_data.get('license_number'),
-            status=license_data.get('status', 'not_licensed'),
-            issued_on=datetime.strptime(license_data['issued_on'], '%Y-%m-%d').date() if license_data.get('issued_on') else None,
-            expires_on=datetime.strptime(license_data['expires_on'], '%Y-%m-%d').date() if license_data.get('expires_on') else None,
-            board_name=license_data.get('board_name'),
-            board_phone=license_data.get('board_phone'),
-            board_email=license_data.get('board_email'),
-            board_url=license_data.get('board_url'),
-            designated_role=license_data.get('designated_role'),
-            renewal_period_years=license_data.get('recurring', {}).get('renewal_period_years', 2),
-            renewal_fee=Decimal(str(license_data.get('recurring', {}).get('renewal_fee', 0)))
-        )
-        db.add(new_license)
-        db.flush()
-        
-        # Create budget if estimated costs provided
-        if 'estimated_costs' in license_data:
-            est = license_data['estimated_costs']
-            budget = RSLicenseBudget(
-                license_id=new_license.id,
-                application_fee=Decimal(str(est.get('application_fee', 0))),
-                test_fee=Decimal(str(est.get('test_fee', 0))),
-                trade_book_fee=Decimal(str(est.get('trade_book_fee', 0))),
-                business_law_book_fee=Decimal(str(est.get('business_law_book_fee', 0))),
-                activation_fee=Decimal(str(est.get('activation_fee', 0))),
-                prep_course_fee=Decimal(str(est.get('prep_course_fee', 0))),
-                travel_estimate=Decimal(str(est.get('travel', 0))),
-                shipping_estimate=Decimal(str(est.get('shipping', 0))),
-                renewal_fee=Decimal(str(est.get('renewal_fee', 0))),
-                continuing_ed_fee=Decimal(str(est.get('continuing_ed_fee', 0)))
-            )
-            db.add(budget)
-        
-        # Update holder's total
-        holder.total_licenses = db.query(RSLicense).filter_by(holder_id=holder.id).count()
-        
-        db.commit()
+        with HolderUnitOfWork(account) as uow:
+            uow.add_license(license_data)
         return True
         
+    except LookupError:
+        return False
     except Exception as e:
-        db.rollback()
         print(f"ERROR adding license: {e}")
         return False
-    finally:
-        db.close()
 
 
 def update_license_in_db(account, license_id, license_data):
     """Update an existing license in the database"""
-    db = SessionLocal()
     try:
-        # Find holder
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
-        
-        if not holder:
-            return False
-        
-        # Find license
-        license = db.query(RSLicense).filter_by(
-            holder_id=holder.id,
-            license_id=license_id
-        ).first()
-        
-        if not license:
-            return False
-        
-        # Update license fields
-        license.jurisdiction = license_data.get('jurisdiction', license.jurisdiction)
-        license.jurisdiction_abbr = license_data.get('jurisdiction_abbr', license.jurisdiction_abbr)
-        license.jurisdiction_type = license_data.get('jurisdiction_type', license.jurisdiction_type)
-        license.license_type = license_data.get('license_type', license.license_type)
-        license.license_number = license_data.get('license_number')
-        license.status = license_data.get('status', license.status)
-        
-        if license_data.get('issued_on'):
-            license.issued_on = datetime.strptime(license_data['issued_on'], '%Y-%m-%d').date()
-        if license_data.get('expires_on'):
-            license.expires_on = datetime.strptime(license_data['expires_on'], '%Y-%m-%d').date()
-        
-        license.board_name = license_data.get('board_name')
-        license.board_phone = license_data.get('board_phone')
-        license.board_email = license_data.get('board_email')
-        license.board_url = license_data.get('board_url')
-        license.designated_role = license_data.get('designated_role')
-        
-        if 'recurring' in license_data:
-            license.renewal_period_years = license_data['recurring'].get('renewal_period_years', 2)
-            license.renewal_fee = Decimal(str(license_data['recurring'].get('renewal_fee', 0)))
-        
-        # Update budget if provided
-        if 'estimated_costs' in license_data:
-            budget = license.budget
-            if not budget:
-                budget = RSLicenseBudget(license_id=license.id)
-                db.add(budget)
-            
-            est = license_data['estimated_costs']
-            budget.application_fee = Decimal(str(est.get('application_fee', 0)))
-            budget.test_fee = Decimal(str(est.get('test_fee', 0)))
-            budget.trade_book_fee = Decimal(str(est.get('trade_book_fee', 0)))
-            budget.business_law_book_fee = Decimal(str(est.get('business_law_book_fee', 0)))
-            budget.activation_fee = Decimal(str(est.get('activation_fee', 0)))
-            budget.prep_course_fee = Decimal(str(est.get('prep_course_fee', 0)))
-            budget.travel_estimate = Decimal(str(est.get('travel', 0)))
-            budget.shipping_estimate = Decimal(str(est.get('shipping', 0)))
-            budget.renewal_fee = Decimal(str(est.get('renewal_fee', 0)))
-            budget.continuing_ed_fee = Decimal(str(est.get('continuing_ed_fee', 0)))
-        
-        db.commit()
+        with HolderUnitOfWork(account) as uow:
+            uow.update_license(license_id, license_data)
         return True
         
+    except LookupError:
+        return False
     except Exception as e:
-        db.rollback()
         print(f"ERROR updating license: {e}")
         return False
-    finally:
-        db.close()
 
 
 def delete_license_from_db(account, license_id):
-    """Delete a license from the database"""
-    db = SessionLocal()
+    """Delete a license from the database (cascade handles costs and budget)"""
     try:
-        # Find holder
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
-        
-        if not holder:
-            return False
-        
-        # Find and delete license (cascade will handle costs and budget)
-        license = db.query(RSLicense).filter_by(
-            holder_id=holder.id,
-            license_id=license_id
-        ).first()
-        
-        if license:
-            db.delete(license)
-            
-            # Update holder's total
-            holder.total_licenses = db.query(RSLicense).filter_by(holder_id=holder.id).count() - 1
-            
-            db.commit()
-            return True
+        with HolderUnitOfWork(account) as uow:
+            deleted = uow.delete_license(license_id)
+        return deleted
         
+    except LookupError:
         return False
-        
     except Exception as e:
-        db.rollback()
         print(f"ERROR deleting license: {e}")
         return False
-    finally:
-        db.close()
 
 
 def add_cost_to_db(account, license_id, cost_data):
     """Add a cost entry to a license"""
     print(f"DEBUG add_cost_to_db: account={account}, license_id={license_id}, cost_data={cost_data}")
-    db = SessionLocal()
     try:
-        # Find holder
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
-        
-        if not holder:
-            return False
-        
-        # Find license
-        license = db.query(RSLicense).filter_by(
-            holder_id=holder.id,
-            license_id=license_id
-        ).first()
-        
-        if not license:
-            return False
-        
-        # Add cost
-        new_cost = RSLicenseCost(
-            license_id=license.id,
-            date=datetime.strptime(cost_data['date'], '%Y-%m-%d').date() if cost_data.get('date') else datetime.now().date(),
-            category=cost_data['category'],
-            amount=Decimal(str(cost_data['amount'])),
-            vendor=cost_data.get('vendor'),
-            notes=cost_data.get('notes')
-        )
-        db.add(new_cost)
-        
-        db.commit()
+        with HolderUnitOfWork(account) as uow:
+            uow.add_cost(license_id, cost_data)
         return True
         
+    except LookupError:
+        return False
     except Exception as e:
-        db.rollback()
         print(f"ERROR adding cost: {e}")
         return False
-    finally:
-        db.close()
 
 
 def delete_cost_from_db(account, license_id, cost_index):
-    """Delete a cost entry"""
+    """Delete a cost entry (cost_index counts the license's costs ordered by date)"""
     print(f"DEBUG delete_cost_from_db: account={account}, license_id={license_id}, cost_index={cost_index}")
-    db = SessionLocal()
     try:
-        # Find holder
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
-        
-        if not holder:
-            return False
-        
-        # Find license
-        license = db.query(RSLicense).filter_by(
-            holder_id=holder.id,
-            license_id=license_id
-        ).first()
-        
-        if not license:
-            return False
-        
-        # Get all costs ordered by date (to match index)
-        costs = db.query(RSLicenseCost).filter_by(license_id=license.id).order_by(RSLicenseCost.date).all()
-        
-        if 0 <= cost_index < len(costs):
-            db.delete(costs[cost_index])
-            db.commit()
-            return True
+        with HolderUnitOfWork(account) as uow:
+            deleted = uow.delete_cost(license_id, cost_index)
+        return deleted
         
+    except LookupError:
         return False
-        
     except Exception as e:
-        db.rollback()
         print(f"ERROR deleting cost: {e}")
         return False
-    finally:
-        db.close()
 
 
-def update_estimated_costs_in_db(account, license_id, estimated_costs):
-    """Update estimated costs (budget) for a license"""
-    db = SessionLocal()
+def update_estimated_costs_in_db(account, license_id, estimated_costs, only_provided=False):
+    """Update estimated costs (budget) for a license (only_provided leaves missing keys unchanged)"""
     try:
-        # Find holder
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
-        
-        if not holder:
-            return False
-        
-        # Find license
-        license = db.query(RSLicense).filter_by(
-            holder_id=holder.id,
-            license_id=license_id
-        ).first()
-        
-        if not license:
-            return False
-        
-        # Get or create budget
-        budget = license.budget
-        if not budget:
-            budget = RSLicenseBudget(license_id=license.id)
-            db.add(budget)
-        
-        # Update budget fields
-        budget.application_fee = Decimal(str(estimated_costs.get('application_fee', 0)))
-        budget.test_fee = Decimal(str(estimated_costs.get('test_fee', 0)))
-        budget.trade_book_fee = Decimal(str(estimated_costs.get('trade_book_fee', 0)))
-        budget.business_law_book_fee = Decimal(str(estimated_costs.get('business_law_book_fee', 0)))
-        budget.activation_fee = Decimal(str(estimated_costs.get('activation_fee', 0)))
-        budget.prep_course_fee = Decimal(str(estimated_costs.get('prep_course_fee', 0)))
-        budget.travel_estimate = Decimal(str(estimated_costs.get('travel', 0)))
-        budget.shipping_estimate = Decimal(str(estimated_costs.get('shipping', 0)))
-        budget.renewal_fee = Decimal(str(estimated_costs.get('renewal_fee', 0)))
-        budget.continuing_ed_fee = Decimal(str(estimated_costs.get('continuing_ed_fee', 0)))
-        
-        db.commit()
+        with HolderUnitOfWork(account) as uow:
+            uow.update_estimated_costs(license_id, estimated_costs, only_provided=only_provided)
         return True
         
+    except LookupError:
+        return False
     except Exception as e:
-        db.rollback()
         print(f"ERROR updating estimated costs: {e}")
         return False
-    finally:
-        db.close()
 
 
 def update_holder_status(account, status, locked_by=None):
     """Update license holder account status (lock/unlock)"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -384,6 +155,7 @@ def update_holder_status(account, status, locked_by=None):
         # For now, we just update status
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -398,9 +170,7 @@ def clear_next_target_state(account):
     """Clear the next target state for a license holder"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -408,6 +178,7 @@ def clear_next_target_state(account):
         holder.next_target_state = None
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -422,9 +193,7 @@ def update_holder_metadata(account, updates_dict):
     """Generic function to update holder metadata fields"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -435,6 +204,8 @@ def update_holder_metadata(account, updates_dict):
                 setattr(holder, key, value)
         
         db.commit()
+        invalidate_holder(account)
+        forget_holder_identity(account)  # employee_id or pin may have changed
         return True
         
     except Exception as e:
@@ -450,9 +221,7 @@ def create_new_holder(user_id, name, role='License Holder', next_target_state=No
     db = SessionLocal()
     try:
         # Check if already exists
-        existing = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == user_id) | (RSLicenseHolder.pin == user_id)
-        ).first()
+        existing = get_holder(db, user_id)
         
         if existing:
             return False, "User already exists"
@@ -471,6 +240,7 @@ def create_new_holder(user_id, name, role='License Holder', next_target_state=No
         
         db.add(new_holder)
         db.commit()
+        invalidate_holder(user_id)
         return True, "Holder created successfully"
         
     except Exception as e:
@@ -485,9 +255,7 @@ def set_next_target_state(account, target_state):
     """Set the next target state for a license holder"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -495,6 +263,7 @@ def set_next_target_state(account, target_state):
         holder.next_target_state = target_state
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -509,9 +278,7 @@ def add_work_history(account, work_entry):
     """Add work history entry to bio data"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -530,6 +297,7 @@ def add_work_history(account, work_entry):
         bio.work_history.insert(0, work_entry)
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -544,9 +312,7 @@ def add_reference(account, reference):
     """Add professional reference to bio data"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -565,6 +331,7 @@ def add_reference(account, reference):
         bio.professional_references.append(reference)
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -579,9 +346,7 @@ def add_job_project(account, job_project):
     """Add job project to plumbing experience"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -600,6 +365,7 @@ def add_job_project(account, job_project):
         bio.job_projects.insert(0, job_project)
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -695,9 +461,7 @@ def update_bio_personal_info(account, personal_info):
     """Update personal info in bio data"""
     db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
+        holder = get_holder(db, account)
         
         if not holder:
             return False
@@ -712,6 +476,7 @@ def update_bio_personal_info(account, personal_info):
         bio.personal_info = personal_info
         
         db.commit()
+        invalidate_holder(account)
         return True
         
     except Exception as e:
@@ -724,49 +489,24 @@ def update_bio_personal_info(account, personal_info):
 
 def bulk_import_licenses(account, licenses_data):
     """Bulk import/update licenses from Excel - update existing licenses only"""
-    db = SessionLocal()
     try:
-        holder = db.query(RSLicenseHolder).filter(
-            (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
-        ).first()
-        
-        if not holder:
-            return False, "Holder not found"
-        
         updated_count = 0
-        
-        # Update existing licenses only (don't create new ones to match current behavior)
-        for license_data in licenses_data:
-            license_id = license_data.get('license_id')
-            
-            license = db.query(RSLicense).filter_by(
-                holder_id=holder.id,
-                license_id=license_id
-            ).first()
-            
-            if license:
-                # Update budget if provided
+        with HolderUnitOfWork(account) as uow:
+            # Update existing licenses only (don't create new ones to match current behavior)
+            for license_data in licenses_data:
+                if not uow.license(license_data.get('license_id')):
+                    continue
+                
+                # Update budget fields that were provided
                 if 'estimated_costs' in license_data:
-                    budget = license.budget
-                    if not budget:
-                        budget = RSLicenseBudget(license_id=license.id)
-                        db.add(budget)
-                    
-                    costs = license_data['estimated_costs']
-                    if costs.get('application_fee') is not None:
-                        budget.application_fee = Decimal(str(costs['application_fee']))
-                    if costs.get('test_fee') is not None:
-                        budget.test_fee = Decimal(str(costs['test_fee']))
-                    # Add other fields as needed
+                    uow.update_estimated_costs(license_data['license_id'], license_data['estimated_costs'], only_provided=True)
                 
                 updated_count += 1
         
-        db.commit()
         return True, f"Updated {updated_count} licenses"
         
+    except LookupError as e:
+        return False, str(e)
     except Exception as e:
-        db.rollback()
         print(f"ERROR bulk importing: {e}")
         return False, str(e)
-    finally:
-        db.close()
@@ -0,0 +1,113 @@
+"""
+In-process cache of license holder snapshots
+Lets page renders skip the database when a holder hasn't changed
+
+Entries expire after HOLDER_CACHE_TTL seconds and the least recently used
+entry is evicted once HOLDER_CACHE_SIZE holders are cached. Every write in
+db_write_functions.py calls invalidate_holder() after it commits. The cache
+lives in each gunicorn worker, so a write made by another worker is only
+picked up once the TTL runs out.
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+HOLDER_CACHE_TTL = int(os.getenv('HOLDER_CACHE_TTL', '60'))  # Seconds
+HOLDER_CACHE_SIZE = int(os.getenv('HOLDER_CACHE_SIZE', '256'))
+
+
+class HolderCache:
+    """TTL + LRU cache of holder dicts keyed by account (employee_id or pin)"""
+
+    def __init__(self, ttl=HOLDER_CACHE_TTL, max_size=HOLDER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # account -> (stored_at, holder_data)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self):
+        """
+        Current invalidation generation
+
+        Read this before loading from the database and pass it to set(), so a
+        load that raced with a write doesn't put a stale snapshot back.
+        """
+        return self._generation
+
+    def get(self, account):
+        """Return a private copy of the cached holder, or None"""
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, holder_data = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[account]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(account)
+            self.hits += 1
+
+        # Callers mutate the dict they get back, so never hand out the original
+        return copy.deepcopy(holder_data)
+
+    def set(self, account, holder_data, generation=None):
+        """Store a snapshot of holder_data for account"""
+        if holder_data is None or self.ttl <= 0 or self.max_size <= 0:
+            return
+
+        snapshot = copy.deepcopy(holder_data)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries[account] = (time.monotonic(), snapshot)
+            self._entries.move_to_end(account)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, account):
+        """Drop every entry for this holder, whether it was cached by employee_id or pin"""
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, (_, holder_data) in self._entries.items()
+                if key == account
+                or holder_data.get('user_id') == account
+                or holder_data.get('pin') == account
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+holder_cache = HolderCache()
+
+
+def invalidate_holder(account):
+    """Forget the cached snapshot for a holder after it has been written"""
+    holder_cache.invalidate(account)
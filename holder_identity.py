@@ -0,0 +1,78 @@
+"""
+Account -> license holder id resolution
+Accounts arrive as an employee_id or a PIN. Each one is resolved to the
+holder's UUID once per process, so later lookups are a primary-key get (often
+an identity-map hit within a request) or a holder_id filter on rs_licenses,
+instead of an OR across employee_id and pin
+
+Unknown accounts aren't remembered, so a newly created holder resolves on
+its next lookup. The mapping lives for the whole process and another worker
+may change an employee_id or PIN, so a cached id is only a hint: callers use
+get_holder() / verified_holder_id(), which re-check that the holder row still
+carries the account and re-resolve if not. update_holder_metadata() also
+forgets the holder's accounts in its own worker.
+"""
+import threading
+from models import RSLicenseHolder
+
+_holder_ids = {}  # employee_id / pin -> holder UUID
+_lock = threading.Lock()
+
+
+def resolve_holder_id(db, account):
+    """
+    Cached UUID for an employee_id or pin, or None
+
+    Not verified against the row; use get_holder() or verified_holder_id()
+    unless the caller checks the loaded holder itself.
+    """
+    if not account:
+        return None
+
+    holder_id = _holder_ids.get(account)
+    if holder_id is not None:
+        return holder_id
+
+    row = db.query(RSLicenseHolder.id, RSLicenseHolder.employee_id, RSLicenseHolder.pin).filter(
+        (RSLicenseHolder.employee_id == account) | (RSLicenseHolder.pin == account)
+    ).first()
+    if row is None:
+        return None
+
+    with _lock:
+        for key in (row.employee_id, row.pin):
+            if key:
+                _holder_ids[key] = row.id
+        _holder_ids[account] = row.id
+    return row.id
+
+
+def get_holder(db, account):
+    """The RSLicenseHolder for an employee_id or pin, loaded by primary key, or None"""
+    holder_id = resolve_holder_id(db, account)
+    if holder_id is None:
+        return None
+
+    holder = db.get(RSLicenseHolder, holder_id)
+    if holder is not None and account in (holder.employee_id, holder.pin):
+        return holder
+
+    # The cached mapping is stale (holder deleted or re-keyed); look it up again
+    forget_holder_identity(account)
+    holder_id = resolve_holder_id(db, account)
+    return db.get(RSLicenseHolder, holder_id) if holder_id is not None else None
+
+
+def verified_holder_id(db, account):
+    """UUID of the holder that currently has this employee_id or pin, or None"""
+    holder = get_holder(db, account)
+    return holder.id if holder is not None else None
+
+
+def forget_holder_identity(account):
+    """Drop the cached id for an account, and every other key mapped to the same holder"""
+    with _lock:
+        holder_id = _holder_ids.pop(account, None)
+        if holder_id is not None:
+            for key in [key for key, value in _holder_ids.items() if value == holder_id]:
+                del _holder_ids[key]
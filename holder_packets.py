@@ -0,0 +1,203 @@
+"""
+Per-holder audit packets
+Renders one cost-and-license PDF per license holder in a process pool and
+streams them back as a single ZIP
+
+reportlab layout is pure Python and holds the GIL, so packets are rendered
+in separate processes. Workers are started with 'spawn' so they don't
+inherit the web worker's database connections or threads. A spawned worker
+imports this module and reportlab, and also re-imports the parent's main
+script as __mp_main__: under gunicorn that is only gunicorn's entry point,
+but under `python app.py` it is all of app.py (everything except the
+__main__ block). Packets are plain dicts (see app.py holder_packet_data),
+so nothing here touches the database.
+
+Each web worker process shares one pool of PACKET_WORKERS processes,
+started on the first export and kept for the life of the process, so
+concurrent exports queue for the same workers instead of each starting
+their own, and the start-up import cost is paid once.
+"""
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+PACKET_WORKERS = int(os.getenv('PACKET_WORKERS', str(os.cpu_count() or 2)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _packet_pool():
+    """The process-wide render pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PACKET_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool so the next export starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _money(value):
+    return f"${value:,.2f}" if value >= 0 else f"-${abs(value):,.2f}"
+
+
+def render_holder_packet(packet):
+    """Render one holder's packet; returns (filename, pdf_bytes)"""
+    from io import BytesIO
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib.enums import TA_CENTER
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=18)
+    styles = getSampleStyleSheet()
+    elements = []
+
+    header_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a2634')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('SPAN', (0, 0), (-1, 0)),
+        ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#f8fafc')),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ]
+
+    # Title
+    title_style = ParagraphStyle('PacketTitle', parent=styles['Heading1'], fontSize=22, textColor=colors.HexColor('#1a2634'), spaceAfter=10, alignment=TA_CENTER)
+    elements.append(Paragraph(f"{escape(packet['name'] or packet['user_id'])} - License &amp; Cost Packet", title_style))
+
+    subtitle_style = ParagraphStyle('PacketSubtitle', parent=styles['Normal'], fontSize=10, textColor=colors.grey, alignment=TA_CENTER, spaceAfter=20)
+    elements.append(Paragraph(
+        f"{escape(packet['role'] or 'License Holder')} &middot; Generated: {datetime.now().strftime('%B %d, %Y')}",
+        subtitle_style
+    ))
+
+    # Summary
+    stats = packet['stats']
+    costs = packet['costs']
+    summary_data = [
+        ['SUMMARY', ''],
+        ['Licenses', str(len(packet['licenses']))],
+        ['States', str(stats['states_count'])],
+        [f"Expiring in {stats['expiring_days']} days", str(stats['expiring_count'])],
+        ['Estimated (initial)', _money(costs['total_estimated'])],
+        ['Total Spent', _money(costs['total_actual'])],
+        ['Annual Recurring', _money(costs['annual_recurring'])]
+    ]
+    summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
+    summary_table.setStyle(TableStyle(header_style + [
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Costs by state
+    if costs['by_state']:
+        state_data = [['COSTS BY STATE', '', '', ''], ['State', 'Initial', 'Renewal', 'Total']]
+        for row in costs['by_state']:
+            state_data.append([row['state'], _money(row['initial']), _money(row['renewal']), _money(row['total'])])
+
+        state_table = Table(state_data, colWidths=[2.2*inch, 1.3*inch, 1.3*inch, 1.3*inch], repeatRows=2)
+        state_table.setStyle(TableStyle(header_style + [
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ]))
+        elements.append(state_table)
+        elements.append(Spacer(1, 0.3*inch))
+
+    # Licenses
+    license_data = [['LICENSES', '', '', '', '', ''], ['Jurisdiction', 'Type', 'Status', 'Expires', 'Budget', 'Actual']]
+    for license in packet['licenses']:
+        license_data.append([
+            license['jurisdiction'] or '',
+            Paragraph(escape(license['license_type'] or ''), styles['BodyText']),
+            license['badge_text'] or '',
+            license['expires_on'] or '-',
+            _money(license['budget']),
+            _money(license['actual'])
+        ])
+
+    license_table = Table(license_data, colWidths=[1.2*inch, 1.8*inch, 1.1*inch, 0.9*inch, 0.9*inch, 0.9*inch], repeatRows=2)
+    license_table.setStyle(TableStyle(header_style + [
+        ('ALIGN', (0, 0), (3, -1), 'LEFT'),
+        ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 2), (-1, -1), 'MIDDLE'),
+    ]))
+    elements.append(license_table)
+
+    doc.build(elements)
+    return packet['filename'], buffer.getvalue()
+
+
+class _ZipChunks:
+    """Write-only file object that collects what zipfile writes, for streaming"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_packets_zip(packets, max_workers=PACKET_WORKERS):
+    """
+    Render packets in the shared process pool and yield a ZIP of them chunk by chunk
+
+    Packets are written to the archive in input order as soon as each is
+    ready, so the download starts after the first PDF rather than the last.
+    This request's pending renders are cancelled if the client goes away. A
+    single packet (or max_workers=1) is rendered in-process.
+    """
+    pool = None
+    futures = []
+    if max_workers > 1 and len(packets) > 1 and PACKET_WORKERS > 1:
+        pool = _packet_pool()
+
+    out = _ZipChunks()
+    try:
+        if pool:
+            futures = [pool.submit(render_holder_packet, packet) for packet in packets]
+            rendered = (future.result() for future in futures)
+        else:
+            rendered = map(render_holder_packet, packets)
+        with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for filename, pdf_bytes in rendered:
+                archive.writestr(filename, pdf_bytes)
+                yield out.drain()
+        yield out.drain()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,232 @@
+"""
+Background jobs for long-running requests
+Work runs on a local thread pool, off the request path; job state is kept in
+a SQLite file so every gunicorn worker on the host can answer /jobs/<id>
+
+A job function is called as fn(progress, *args, **kwargs), where
+progress(percent, message) records how far along it is. It returns a dict
+with 'data' (JSON-serializable, returned by the status endpoint) and
+optionally 'file' as (filename, mimetype, bytes or a binary file object)
+for /jobs/<id>/download; file objects are copied to disk and closed.
+
+A running job records a heartbeat every JOB_HEARTBEAT_SECONDS. If the
+process running it dies (restart, OOM kill), the job is marked failed once
+its heartbeat is JOB_STALE_SECONDS old, or once it has been queued for
+JOB_QUEUE_TIMEOUT_SECONDS, so pollers get an answer instead of waiting forever.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration
+JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'licensing_jobs'))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))  # Per gunicorn worker process
+JOB_RETENTION_HOURS = int(os.getenv('JOB_RETENTION_HOURS', '24'))  # Finished jobs and their files are pruned after this
+JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', '15'))
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '120'))  # Running job with no heartbeat for this long is failed
+JOB_QUEUE_TIMEOUT_SECONDS = int(os.getenv('JOB_QUEUE_TIMEOUT_SECONDS', '3600'))  # Queued job never started is failed
+
+JOBS_DB = os.path.join(JOBS_DIR, 'jobs.sqlite3')
+
+_executor = None
+_executor_lock = threading.Lock()
+_schema_ready = False
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        owner TEXT,
+        status TEXT NOT NULL,
+        progress INTEGER NOT NULL DEFAULT 0,
+        message TEXT,
+        data TEXT,
+        result_file TEXT,
+        result_name TEXT,
+        result_mimetype TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        heartbeat_at REAL,
+        finished_at REAL
+    )
+"""
+
+
+def _connect():
+    """Open the job store, creating it on first use"""
+    global _schema_ready
+
+    if not _schema_ready:
+        os.makedirs(JOBS_DIR, exist_ok=True)
+
+    conn = sqlite3.connect(JOBS_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(SCHEMA)
+        # Job stores created before heartbeats existed
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(jobs)')]
+        if 'heartbeat_at' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at REAL')
+        conn.commit()
+        _schema_ready = True
+    return conn
+
+
+def _update(job_id, **fields):
+    columns = ', '.join(f'{name} = ?' for name in fields)
+    conn = _connect()
+    try:
+        conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+        return _executor
+
+
+def _heartbeat(job_id, stopped):
+    """Refresh a running job's heartbeat until stopped is set"""
+    while not stopped.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            _update(job_id, heartbeat_at=time.time())
+        except sqlite3.Error as e:
+            print(f"ERROR recording heartbeat for job {job_id}: {e}")
+
+
+def _run(job_id, fn, args, kwargs):
+    """Execute one job on a pool thread and record its outcome"""
+    now = time.time()
+    _update(job_id, status='running', started_at=now, heartbeat_at=now)
+
+    stopped = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stopped), name=f'job-heartbeat-{job_id}', daemon=True).start()
+
+    def progress(percent, message=None):
+        _update(job_id, progress=int(percent), message=message, heartbeat_at=time.time())
+
+    try:
+        result = fn(progress, *args, **kwargs) or {}
+
+        fields = {'data': json.dumps(result.get('data'), default=str)}
+        if result.get('file'):
+            filename, mimetype, content = result['file']
+            path = os.path.join(JOBS_DIR, f'{job_id}.out')
+            with open(path, 'wb') as f:
+                if isinstance(content, bytes):
+                    f.write(content)
+                else:
+                    with content:
+                        shutil.copyfileobj(content, f)
+            fields.update(result_file=path, result_name=filename, result_mimetype=mimetype)
+
+        _update(job_id, status='done', progress=100, finished_at=time.time(), **fields)
+
+    except Exception as e:
+        print(f"ERROR in job {job_id}: {e}")
+        _update(job_id, status='failed', message=str(e), finished_at=time.time())
+    finally:
+        stopped.set()
+
+
+def _fail_abandoned_jobs(conn):
+    """Mark jobs whose worker process went away as failed"""
+    now = time.time()
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', finished_at = ?, "
+        "message = 'The worker running this job stopped responding; please try again' "
+        "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ?",
+        (now, now - JOB_STALE_SECONDS)
+    )
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', finished_at = ?, "
+        "message = 'This job was never started; please try again' "
+        "WHERE status = 'queued' AND created_at < ?",
+        (now, now - JOB_QUEUE_TIMEOUT_SECONDS)
+    )
+    conn.commit()
+
+
+def submit_job(kind, fn, *args, owner=None, **kwargs):
+    """Queue fn to run in the background and return the new job's id"""
+    prune_jobs()
+
+    job_id = uuid.uuid4().hex
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO jobs (id, kind, owner, status, created_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, kind, owner, 'queued', time.time())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    _get_executor().submit(_run, job_id, fn, args, kwargs)
+    return job_id
+
+
+def get_job(job_id):
+    """Job record as a dict (data decoded), or None"""
+    conn = _connect()
+    try:
+        _fail_abandoned_jobs(conn)
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+
+    job = dict(row)
+    job['data'] = json.loads(job['data']) if job['data'] else None
+    return job
+
+
+def job_status(job):
+    """Public view of a job for the status endpoint (no filesystem paths)"""
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'data': job['data'],
+        'has_file': bool(job['result_file']),
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at']
+    }
+
+
+def prune_jobs():
+    """Fail abandoned jobs, then delete finished jobs (and result files) older than JOB_RETENTION_HOURS"""
+    cutoff = time.time() - JOB_RETENTION_HOURS * 3600
+    conn = _connect()
+    try:
+        _fail_abandoned_jobs(conn)
+        rows = conn.execute(
+            "SELECT id, result_file FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (cutoff,)
+        ).fetchall()
+        for row in rows:
+            if row['result_file'] and os.path.exists(row['result_file']):
+                os.remove(row['result_file'])
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (cutoff,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,84 @@
+"""
+Rendered-HTML cache for markdown content files (data/states/*.md)
+Markdown conversion with the 'extra' and 'nl2br' extensions costs far more
+than the rest of a state page, so each file is rendered once and the HTML is
+reused until the file's content changes
+
+Entries are keyed by path and checked against a hash of the file's current
+content, so an edited file is re-rendered on its next request (in every
+gunicorn worker) without any explicit invalidation. Set MARKDOWN_WARMUP=1 to
+pre-render every state file when the app starts.
+"""
+import glob
+import hashlib
+import os
+import threading
+import markdown
+
+MARKDOWN_EXTENSIONS = ['extra', 'nl2br']
+MARKDOWN_WARMUP = os.getenv('MARKDOWN_WARMUP', '0') == '1'
+
+_local = threading.local()
+
+
+def _converter():
+    """Per-thread Markdown instance; building one loads every extension"""
+    md = getattr(_local, 'md', None)
+    if md is None:
+        md = _local.md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return md.reset()
+
+
+class MarkdownCache:
+    """Rendered HTML keyed by file path, valid while the content hash matches"""
+
+    def __init__(self):
+        self._entries = {}  # path -> (content_digest, html)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    def render_file(self, path):
+        """HTML for a markdown file, or None if it doesn't exist"""
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == digest:
+                self.hits += 1
+                return entry[1]
+
+        html = _converter().convert(content.decode('utf-8'))
+        with self._lock:
+            self._entries[path] = (digest, html)
+            self.renders += 1
+        return html
+
+    def warm(self, directory):
+        """Pre-render every .md file in a directory; returns how many were rendered"""
+        paths = glob.glob(os.path.join(directory, '*.md'))
+        for path in paths:
+            try:
+                self.render_file(path)
+            except Exception as e:
+                print(f"ERROR pre-rendering {path}: {e}")
+        return len(paths)
+
+    def stats(self):
+        """Hit/render counters and the number of files cached"""
+        with self._lock:
+            return {
+                'files': len(self._entries),
+                'hits': self.hits,
+                'renders': self.renders
+            }
+
+
+markdown_cache = MarkdownCache()
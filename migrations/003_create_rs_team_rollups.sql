@@ -0,0 +1,75 @@
+-- Team rollup table
+-- One precomputed row per (holder, state) so director dashboards read
+-- aggregates instead of re-scanning every license on each page view.
+-- Kept current by refresh_team_rollup() in the write helpers; run
+-- rebuild_team_rollups() (team_aggregates.py) to resync after manual edits.
+
+CREATE TABLE rs_team_rollups (
+    holder_id UUID NOT NULL REFERENCES rs_license_holders(id) ON DELETE CASCADE,
+    jurisdiction_abbr VARCHAR(2) NOT NULL,
+    jurisdiction VARCHAR(100),
+    license_type VARCHAR(100),
+    board_name VARCHAR(255),
+    board_url TEXT,
+    status VARCHAR(50) NOT NULL DEFAULT 'not_licensed',
+    license_count INTEGER NOT NULL DEFAULT 0,
+    licensed_count INTEGER NOT NULL DEFAULT 0,
+    in_progress_count INTEGER NOT NULL DEFAULT 0,
+    earliest_expires_on DATE,
+    renewal_fees DECIMAL(12,2) NOT NULL DEFAULT 0,
+    annual_recurring_cost DECIMAL(12,2) NOT NULL DEFAULT 0,
+    estimated_total DECIMAL(12,2) NOT NULL DEFAULT 0,
+    actual_spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (holder_id, jurisdiction_abbr)
+);
+
+CREATE INDEX idx_rs_team_rollups_state ON rs_team_rollups(jurisdiction_abbr);
+CREATE INDEX idx_rs_team_rollups_expires ON rs_team_rollups(earliest_expires_on);
+
+-- Initial population from existing licenses
+INSERT INTO rs_team_rollups (
+    holder_id, jurisdiction_abbr, jurisdiction, license_type, board_name, board_url,
+    status, license_count, licensed_count, in_progress_count, earliest_expires_on,
+    renewal_fees, annual_recurring_cost, estimated_total, actual_spent
+)
+SELECT
+    l.holder_id,
+    l.jurisdiction_abbr,
+    MIN(l.jurisdiction),
+    MIN(l.license_type),
+    MIN(l.board_name),
+    MIN(l.board_url),
+    CASE
+        WHEN SUM(CASE WHEN l.status = 'licensed' THEN 1 ELSE 0 END) > 0 THEN 'licensed'
+        WHEN SUM(CASE WHEN l.status = 'in_progress' THEN 1 ELSE 0 END) > 0 THEN 'in_progress'
+        ELSE 'not_licensed'
+    END,
+    COUNT(*),
+    SUM(CASE WHEN l.status = 'licensed' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN l.status = 'in_progress' THEN 1 ELSE 0 END),
+    MIN(l.expires_on),
+    COALESCE(SUM(l.renewal_fee), 0),
+    -- Same rule as the cost pages (and team_aggregates._rollup_aggregates):
+    -- renewal fee / period, nothing for a 0-year period
+    COALESCE(SUM(
+        CASE WHEN COALESCE(l.renewal_period_years, 2) > 0
+             THEN l.renewal_fee / COALESCE(l.renewal_period_years, 2)
+             ELSE 0
+        END
+    ), 0),
+    COALESCE(SUM(
+        (SELECT COALESCE(b.application_fee, 0) + COALESCE(b.test_fee, 0)
+              + COALESCE(b.trade_book_fee, 0) + COALESCE(b.business_law_book_fee, 0)
+              + COALESCE(b.activation_fee, 0) + COALESCE(b.prep_course_fee, 0)
+              + COALESCE(b.travel_estimate, 0) + COALESCE(b.shipping_estimate, 0)
+         FROM rs_license_budgets b WHERE b.license_id = l.id LIMIT 1)
+    ), 0),
+    COALESCE(SUM(
+        (SELECT SUM(c.amount) FROM rs_license_costs c WHERE c.license_id = l.id)
+    ), 0)
+FROM rs_licenses l
+GROUP BY l.holder_id, l.jurisdiction_abbr;
+
+-- Success
+SELECT 'rs_team_rollups table created successfully!' as result;
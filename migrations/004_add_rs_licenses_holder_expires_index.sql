@@ -0,0 +1,8 @@
+-- Composite index for per-holder "expiring within N days" queries
+-- (licenses_expiring_between / count_licenses_expiring_between with a holder).
+-- Team-wide windows keep using idx_rs_licenses_expires from 001.
+
+CREATE INDEX IF NOT EXISTS idx_rs_licenses_holder_expires ON rs_licenses(holder_id, expires_on);
+
+-- Success
+SELECT 'idx_rs_licenses_holder_expires created successfully!' as result;
@@ -0,0 +1,14 @@
+-- One budget per license, enforced
+-- Needed for INSERT ... ON CONFLICT (license_id) upserts in the CSV import.
+
+-- Keep only the most recently updated budget if duplicates slipped in
+DELETE FROM rs_license_budgets b
+USING rs_license_budgets newer
+WHERE b.license_id = newer.license_id
+  AND (COALESCE(b.updated_at, 'epoch'::timestamp), b.id)
+    < (COALESCE(newer.updated_at, 'epoch'::timestamp), newer.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rs_license_budgets_license ON rs_license_budgets(license_id);
+
+-- Success
+SELECT 'idx_rs_license_budgets_license created successfully!' as result;
@@ -0,0 +1,13 @@
+-- Unique index on rs_license_holders.employee_id
+-- Holders are looked up by employee_id or pin; pin already has a UNIQUE
+-- constraint, so with both indexed the OR lookup is a bitmap OR of two
+-- index probes instead of a sequential scan.
+--
+-- If this fails on duplicates, find them with:
+--   SELECT employee_id, COUNT(*) FROM rs_license_holders
+--   WHERE employee_id IS NOT NULL GROUP BY employee_id HAVING COUNT(*) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rs_license_holders_employee_id ON rs_license_holders(employee_id);
+
+-- Success
+SELECT 'idx_rs_license_holders_employee_id created successfully!' as result;
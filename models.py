@@ -5,7 +5,9 @@ Maps to rs_* tables in shared compliance database
 from sqlalchemy import create_engine, Column, String, Integer, Date, Numeric, Boolean, Text, TIMESTAMP, ForeignKey, ARRAY
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, Session
+from sqlalchemy.pool import QueuePool
+from contextvars import ContextVar
 from datetime import datetime
 import uuid
 import os
@@ -21,7 +23,7 @@ class RSLicenseHolder(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True))
-    employee_id = Column(String(50))
+    employee_id = Column(String(50), unique=True)
     full_name = Column(String(255), nullable=False)
     role = Column(String(100))
     hire_date = Column(Date)
@@ -90,7 +92,7 @@ class RSLicenseBudget(Base):
     __tablename__ = 'rs_license_budgets'
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    license_id = Column(UUID(as_uuid=True), ForeignKey('rs_licenses.id', ondelete='CASCADE'), nullable=False)
+    license_id = Column(UUID(as_uuid=True), ForeignKey('rs_licenses.id', ondelete='CASCADE'), nullable=False, unique=True)
     application_fee = Column(Numeric(10, 2), default=0)
     test_fee = Column(Numeric(10, 2), default=0)
     trade_book_fee = Column(Numeric(10, 2), default=0)
@@ -139,13 +141,143 @@ class RSBioData(Base):
     # Relationships
     holder = relationship("RSLicenseHolder", back_populates="bio_data")
 
+class RSTeamRollup(Base):
+    __tablename__ = 'rs_team_rollups'
+    
+    holder_id = Column(UUID(as_uuid=True), ForeignKey('rs_license_holders.id', ondelete='CASCADE'), primary_key=True)
+    jurisdiction_abbr = Column(String(2), primary_key=True)
+    jurisdiction = Column(String(100))
+    license_type = Column(String(100))
+    board_name = Column(String(255))
+    board_url = Column(Text)
+    status = Column(String(50), nullable=False, default='not_licensed')
+    license_count = Column(Integer, nullable=False, default=0)
+    licensed_count = Column(Integer, nullable=False, default=0)
+    in_progress_count = Column(Integer, nullable=False, default=0)
+    earliest_expires_on = Column(Date)
+    renewal_fees = Column(Numeric(12, 2), nullable=False, default=0)
+    annual_recurring_cost = Column(Numeric(12, 2), nullable=False, default=0)
+    estimated_total = Column(Numeric(12, 2), nullable=False, default=0)
+    actual_spent = Column(Numeric(12, 2), nullable=False, default=0)
+    refreshed_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # Database connection
 DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL not found in environment variables")
 
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connection pool - the database is shared with the Partner Portal, so keep
+# our footprint capped: at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+# per process, pinged before use and recycled before server-side timeouts
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_APPLICATION_NAME = os.getenv('DB_APPLICATION_NAME', 'licensing-roadmap')  # Shown in pg_stat_activity
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={'application_name': DB_APPLICATION_NAME} if DATABASE_URL.startswith('postgres') else {}
+)
+
+
+class RequestSession(Session):
+    """
+    Session shared by every helper called during one web request
+
+    It is bound to one pooled connection for the whole request, so the next
+    helper reuses it instead of checking out (and pre-pinging) a new one.
+    Helpers keep calling close() when they finish; here that ends the
+    transaction (rolling back anything not committed) once the outermost
+    helper using the session closes it, but keeps the session and its
+    connection. A failed query therefore only fails its own helper, and no
+    transaction stays open on the shared database between helpers or while
+    templates render. end() really closes it at request teardown.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.users = 0  # Helpers currently holding the session (they can nest)
+
+    def close(self):
+        self.users = max(0, self.users - 1)
+        if self.users == 0 and self.in_transaction():
+            self.rollback()
+
+    def end(self):
+        connection = self.bind
+        try:
+            super().close()
+        finally:
+            connection.close()
+
+
+_session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_request_session_factory = sessionmaker(class_=RequestSession, autocommit=False, autoflush=False)
+_request_scope = ContextVar('request_scope', default=None)
+
+
+def SessionLocal():
+    """
+    Session for a database helper
+
+    Inside a web request (between begin_request_session and
+    end_request_session) this is the request's shared RequestSession,
+    created on first use. Elsewhere - scripts, background jobs, worker
+    threads - it's a new independent session, as before.
+    """
+    scope = _request_scope.get()
+    if scope is None:
+        return _session_factory()
+    if scope['session'] is None:
+        scope['session'] = _request_session_factory(bind=engine.connect())
+    scope['session'].users += 1
+    return scope['session']
+
+
+def begin_request_session():
+    """Start a request scope for SessionLocal(); returns the token for end_request_session"""
+    return _request_scope.set({'session': None})
+
+
+def end_request_session(token, failed=False):
+    """
+    Close the request's session (if one was used) and leave the request scope
+
+    failed=True (the request raised) rolls back whatever the session still
+    has open before the connection goes back to the pool.
+    """
+    scope = _request_scope.get()
+    _request_scope.reset(token)
+    if scope and scope['session'] is not None:
+        if failed:
+            scope['session'].rollback()
+        scope['session'].end()
+
+
+def pool_stats():
+    """Connection pool counters for this process"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {'status': pool.status()}
+
+    return {
+        'pool_size': pool.size(),
+        'max_overflow': DB_MAX_OVERFLOW,
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'pre_ping': DB_POOL_PRE_PING,
+        'recycle': DB_POOL_RECYCLE
+    }
+
 
 def get_db():
     """Get database session"""
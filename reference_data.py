@@ -0,0 +1,96 @@
+"""
+Per-process cache of parsed JSON reference data
+Files under data/ (all_states.json, licensing_roadmap.json, training
+roadmaps, company coverage) are read and parsed once per worker and re-read
+only after they change on disk
+
+Freshness is checked with a stat() of the file at most every
+REFERENCE_DATA_CHECK_INTERVAL seconds; a changed mtime or size reloads it, a
+deleted file falls back to the caller's default. The parsed object is shared
+between requests: treat it as read-only and copy anything you need to modify.
+"""
+import json
+import os
+import threading
+import time
+
+REFERENCE_DATA_CHECK_INTERVAL = float(os.getenv('REFERENCE_DATA_CHECK_INTERVAL', '2'))  # Seconds between stat checks
+
+
+class ReferenceDataCache:
+    """Parsed JSON keyed by path, reloaded when the file's mtime or size changes"""
+
+    def __init__(self, check_interval=REFERENCE_DATA_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._entries = {}  # path -> [signature, checked_at, value, version]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def load(self, path, default=None):
+        """Parsed contents of a JSON file (shared, don't mutate), or default if it doesn't exist"""
+        return self.load_versioned(path, default)[0]
+
+    def load_versioned(self, path, default=None):
+        """
+        (value, version) for a JSON file
+
+        version identifies the file contents that value was parsed from
+        (mtime and size), or is 'missing' when default is returned, so it can
+        be used as an ETag for anything derived from value.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - entry[1] < self.check_interval:
+                self.hits += 1
+                return entry[2], entry[3]
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return default, 'missing'
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                entry[1] = now
+                self.hits += 1
+                return entry[2], entry[3]
+
+        with open(path, 'r') as f:
+            value = json.load(f)
+
+        version = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+        with self._lock:
+            self._entries[path] = [signature, now, value, version]
+            self.loads += 1
+        return value, version
+
+    def invalidate(self, path=None):
+        """Forget one file (or every file) so the next load re-reads it"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self):
+        """Hit/load counters and the number of files cached"""
+        with self._lock:
+            return {
+                'files': len(self._entries),
+                'hits': self.hits,
+                'loads': self.loads
+            }
+
+
+reference_data = ReferenceDataCache()
+
+
+def load_reference_json(path, default=None):
+    """Shortcut for reference_data.load()"""
+    return reference_data.load(path, default)
@@ -0,0 +1,115 @@
+"""
+In-process cache of generated cost analytics PDFs
+Lets repeat report downloads skip rebuilding the reportlab document when no
+cost, budget or license behind the report has changed
+
+Each entry is stored under a stamp hashed from rs_team_rollups (row count,
+latest refreshed_at and the cost sums), which every license/cost/budget
+write refreshes in its own transaction, plus the holders' updated_at and
+today's date (the report prints it). A write made by another gunicorn worker
+therefore still changes the stamp. The cost writers in db_write_functions.py
+also call invalidate_cost_report() so stale PDFs are dropped right away.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from sqlalchemy import func
+from models import SessionLocal, RSLicenseHolder, RSTeamRollup
+from holder_identity import verified_holder_id
+
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', '32'))  # PDFs kept per worker
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))  # Larger PDFs aren't cached
+
+
+def cost_report_stamp(account):
+    """Content stamp for the cost data behind account's report ('director' for the team)"""
+    db = SessionLocal()
+    try:
+        query = db.query(
+            func.count(RSTeamRollup.holder_id),
+            func.max(RSTeamRollup.refreshed_at),
+            func.sum(RSTeamRollup.actual_spent),
+            func.sum(RSTeamRollup.estimated_total),
+            func.sum(RSTeamRollup.annual_recurring_cost),
+            func.max(RSLicenseHolder.updated_at)
+        ).join(RSLicenseHolder, RSTeamRollup.holder_id == RSLicenseHolder.id)
+
+        if account != 'director':
+            query = query.filter(RSTeamRollup.holder_id == verified_holder_id(db, account))
+
+        row = query.one()
+        return hashlib.sha256(repr((account, date.today().isoformat(), *row)).encode()).hexdigest()
+
+    finally:
+        db.close()
+
+
+class ReportCache:
+    """LRU cache of PDF bytes keyed by account, valid while the stamp matches"""
+
+    def __init__(self, max_size=REPORT_CACHE_SIZE, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # account -> (stamp, pdf_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, account, stamp):
+        """Cached PDF bytes for account if built from the same stamp, else None"""
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(account)
+            self.hits += 1
+            return entry[1]
+
+    def accepts(self, size):
+        """Whether a PDF of this many bytes would be cached"""
+        return self.max_size > 0 and size <= self.max_bytes
+
+    def set(self, account, stamp, pdf_bytes):
+        """Store the PDF built for account at stamp"""
+        if not self.accepts(len(pdf_bytes)):
+            return
+
+        with self._lock:
+            self._entries[account] = (stamp, pdf_bytes)
+            self._entries.move_to_end(account)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, account):
+        """Drop a holder's report and the team report that includes it"""
+        with self._lock:
+            self._entries.pop(account, None)
+            self._entries.pop('director', None)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'bytes': sum(len(pdf_bytes) for _, pdf_bytes in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+report_cache = ReportCache()
+
+
+def invalidate_cost_report(account):
+    """Forget cached PDFs that include a holder's costs after a write"""
+    report_cache.invalidate(account)
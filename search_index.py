@@ -0,0 +1,269 @@
+"""
+In-process full-text search over the state encyclopedia and license records
+Backs /api/search: an inverted index of every data/state_details file (via
+the state_details index) and every rs_licenses row, ranked with BM25
+
+The index is rebuilt in full when either source changes: the state files
+when state_details hands back a new listing, the licenses when
+team_aggregates.team_data_version() changes. Sources are checked at
+most every SEARCH_INDEX_CHECK_INTERVAL seconds. A rebuild for a team-sized
+dataset takes tens of milliseconds; queries only touch the postings of
+their own terms.
+
+Terms are lower-cased alphanumeric runs. Every term must match (AND), and
+the last term also matches as a prefix unless the query ends in a space, so
+results update as someone types.
+"""
+import bisect
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from models import SessionLocal, RSLicense, RSLicenseHolder
+from state_details import state_details
+from team_aggregates import team_data_version
+
+SEARCH_INDEX_CHECK_INTERVAL = float(os.getenv('SEARCH_INDEX_CHECK_INTERVAL', '2'))  # Seconds between source checks
+SEARCH_MAX_PREFIX_TERMS = 50  # Vocabulary terms a trailing prefix may expand to
+
+# Field weights (a term in a heavier field counts as that many occurrences)
+STATE_FIELD_WEIGHTS = {'state': 4, 'state_abbr': 4, 'governing_body': 2, 'license_types': 2}
+LICENSE_FIELD_WEIGHTS = {
+    'license_number': 4,
+    'license_type': 3,
+    'jurisdiction': 2,
+    'jurisdiction_abbr': 2,
+    'board_name': 2,
+    'holder_name': 1,
+    'employee_id': 1,
+    'status': 1
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+KEYWORD_BOOST = 3.0  # Multiplier when every query term hits a document's keywords (state name/abbr, license number)
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric terms in a string"""
+    return _TOKEN.findall(str(text).lower())
+
+
+def _strings(value):
+    """Every string/number nested inside a JSON value"""
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+    elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        yield str(value)
+
+
+def _state_document(state):
+    data = state['data']
+    terms = defaultdict(float)
+    for key, value in data.items():
+        weight = STATE_FIELD_WEIGHTS.get(key, 1)
+        for text in _strings(value):
+            for term in tokenize(text):
+                terms[term] += weight
+
+    return {
+        'type': 'state',
+        'id': state['abbr'],
+        'title': f"{state['name']} ({state['abbr']})",
+        'subtitle': data.get('governing_body') or '',
+        'url': f"/state/{state['abbr']}"
+    }, terms, set(tokenize(f"{state['name']} {state['abbr']}"))
+
+
+def _license_document(row):
+    terms = defaultdict(float)
+    for key, weight in LICENSE_FIELD_WEIGHTS.items():
+        value = getattr(row, key)
+        if value:
+            for term in tokenize(value):
+                terms[term] += weight
+
+    return {
+        'type': 'license',
+        'id': row.license_id,
+        'title': f"{row.license_type} - {row.jurisdiction}",
+        'subtitle': ' · '.join(filter(None, [row.license_number, row.holder_name, row.status])),
+        'holder_id': row.holder_id,
+        'employee_id': row.employee_id,
+        'expires_on': row.expires_on.isoformat() if row.expires_on else None
+    }, terms, set(tokenize(row.license_number or ''))
+
+
+class InvertedIndex:
+    """Immutable BM25 index over (document, {term: weighted frequency}, keywords) entries"""
+
+    def __init__(self, entries):
+        self.documents = []
+        self._postings = defaultdict(dict)  # term -> {doc number: weighted frequency}
+        self._lengths = []
+        self._keywords = []
+
+        for document, terms, keywords in entries:
+            number = len(self.documents)
+            self.documents.append(document)
+            self._keywords.append(keywords)
+            self._lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self._postings[term][number] = frequency
+
+        self._vocabulary = sorted(self._postings)
+        self._average_length = (sum(self._lengths) / len(self._lengths) if self._lengths else 0) or 1
+
+    def _idf(self, postings):
+        count = len(self.documents)
+        return math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+
+    def _expand(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = []
+        for term in self._vocabulary[start:start + SEARCH_MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def _term_scores(self, terms):
+        """Best BM25 score per document over a group of alternative terms"""
+        scores = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(postings)
+            for number, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[number] / self._average_length)
+                score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                if score > scores.get(number, 0):
+                    scores[number] = score
+        return scores
+
+    def search(self, query, include=None):
+        """[(score, document)] matching every query term, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        prefix_last = not query[-1:].isspace()
+        totals = None
+        groups = []
+        for position, term in enumerate(terms):
+            alternatives = [term]
+            if prefix_last and position == len(terms) - 1:
+                alternatives = self._expand(term) or alternatives
+            groups.append(alternatives)
+
+            scores = self._term_scores(alternatives)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {number: totals[number] + score for number, score in scores.items() if number in totals}
+            if not totals:
+                return []
+
+        results = []
+        for number, score in totals.items():
+            if include is not None and not include(self.documents[number]):
+                continue
+            # "texas" or a license number should put that page/license first
+            keywords = self._keywords[number]
+            if keywords and all(any(term in keywords for term in group) for group in groups):
+                score *= KEYWORD_BOOST
+            results.append((score, self.documents[number]))
+        results.sort(key=lambda result: (-result[0], result[1]['title']))
+        return results
+
+
+class SearchIndex:
+    """Keeps an InvertedIndex in step with the state files and rs_licenses"""
+
+    def __init__(self, check_interval=SEARCH_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._index = None
+        self._states = None  # state_details listing the index was built from
+        self._license_stamp = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.last_build_ms = None
+
+    def _license_entries(self, db):
+        rows = db.query(
+            RSLicense.license_id,
+            RSLicense.license_type,
+            RSLicense.license_number,
+            RSLicense.jurisdiction,
+            RSLicense.jurisdiction_abbr,
+            RSLicense.board_name,
+            RSLicense.status,
+            RSLicense.expires_on,
+            RSLicense.holder_id,
+            RSLicenseHolder.employee_id,
+            RSLicenseHolder.full_name.label('holder_name')
+        ).join(RSLicenseHolder, RSLicense.holder_id == RSLicenseHolder.id).all()
+        return [_license_document(row) for row in rows]
+
+    def current(self):
+        """The index, rebuilt first if a source changed since the last check"""
+        with self._lock:
+            now = time.monotonic()
+            if self._index is not None and now - self._checked_at < self.check_interval:
+                return self._index
+            self._checked_at = now
+
+            states = state_details.summaries()
+            license_stamp = team_data_version()
+            if self._index is not None and states is self._states and license_stamp == self._license_stamp:
+                return self._index
+
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                entries = [_state_document(state) for state in states] + self._license_entries(db)
+            finally:
+                db.close()
+
+            self._index = InvertedIndex(entries)
+            self._states = states
+            self._license_stamp = license_stamp
+            self.builds += 1
+            self.last_build_ms = round((time.perf_counter() - started) * 1000, 1)
+            return self._index
+
+    def search(self, query, holder_id=None, all_licenses=False, page=1, per_page=20):
+        """
+        One page of ranked results for a query
+
+        Licenses are only included for holder_id unless all_licenses is set
+        (managers); state pages are visible to everyone.
+        """
+        def include(document):
+            return document['type'] != 'license' or all_licenses or document['holder_id'] == holder_id
+
+        results = self.current().search(query, include)
+        start = (page - 1) * per_page
+        return len(results), results[start:start + per_page]
+
+    def stats(self):
+        """Size of the current index and how often it has been rebuilt"""
+        with self._lock:
+            return {
+                'documents': len(self._index.documents) if self._index else 0,
+                'builds': self.builds,
+                'last_build_ms': self.last_build_ms
+            }
+
+
+search_index = SearchIndex()
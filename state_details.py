@@ -0,0 +1,181 @@
+"""
+In-memory index of the state encyclopedia (data/state_details/*.json)
+Loads every state file once, keyed by abbreviation, with its completion score
+precomputed, so the directory pages and /state/<abbr> don't re-read and
+re-score the files on every view
+
+The directory is re-scanned at most every STATE_DETAILS_CHECK_INTERVAL
+seconds and only files whose mtime or size changed are re-read, which also
+picks up edits made by another gunicorn worker or by hand. save_state()
+writes through the index, so an admin sees their own edit immediately.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+STATE_DETAILS_DIR = os.path.join('data', 'state_details')
+STATE_DETAILS_CHECK_INTERVAL = float(os.getenv('STATE_DETAILS_CHECK_INTERVAL', '2'))  # Seconds between mtime scans
+
+
+def calculate_state_completion(state_data):
+    """Calculate what percentage of state data is filled out"""
+    total_fields = 0
+    filled_fields = 0
+
+    # Basic info (5 fields)
+    basic_fields = ['governing_body', 'board_phone', 'board_website', 'board_address']
+    total_fields += len(basic_fields)
+    filled_fields += sum(1 for f in basic_fields if state_data.get(f) and state_data.get(f) != 'TBD' and '000-000' not in str(state_data.get(f)))
+
+    # License types (count as 1 major section)
+    total_fields += 1
+    if state_data.get('license_types') and len(state_data['license_types']) > 0:
+        first_license = state_data['license_types'][0]
+        if first_license.get('experience_required') != 'TBD':
+            filled_fields += 1
+
+    # Requirements (count as 1 major section)
+    total_fields += 1
+    if state_data.get('requirements', {}).get('education') != 'TBD':
+        filled_fields += 1
+
+    # Examination (count as 1 major section)
+    total_fields += 1
+    if state_data.get('examination', {}).get('provider') != 'TBD':
+        filled_fields += 1
+
+    # Application process (count as 1 major section)
+    total_fields += 1
+    if state_data.get('application_process') and len(state_data['application_process']) > 1:
+        filled_fields += 1
+
+    # Renewal (count as 1 major section)
+    total_fields += 1
+    renewal_fee = state_data.get('renewal', {}).get('renewal_fee', 0)
+    # Handle both string and int renewal fees
+    if renewal_fee and str(renewal_fee).strip() and renewal_fee != 0:
+        filled_fields += 1
+
+    return int((filled_fields / total_fields) * 100) if total_fields > 0 else 0
+
+
+class StateDetailsIndex:
+    """State detail files keyed by abbreviation (upper-case file name)"""
+
+    def __init__(self, directory=STATE_DETAILS_DIR, check_interval=STATE_DETAILS_CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._entries = {}  # abbr -> {'data', 'completion', 'file_path', 'signature'}
+        self._summaries = None  # Sorted directory listing, rebuilt after a change
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _load_entry(self, file_path, signature):
+        with open(file_path, 'r') as f:
+            state_data = json.load(f)
+        return {
+            'data': state_data,
+            'completion': calculate_state_completion(state_data),
+            'file_path': file_path,
+            'signature': signature
+        }
+
+    def _refresh(self, force=False):
+        """Re-read new or modified files and drop deleted ones (caller holds the lock)"""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        seen = set()
+        changed = False
+        try:
+            dir_entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            dir_entries = []
+
+        for dir_entry in dir_entries:
+            if not dir_entry.name.endswith('.json') or not dir_entry.is_file():
+                continue
+
+            abbr = dir_entry.name[:-len('.json')].upper()
+            seen.add(abbr)
+            stat = dir_entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+
+            current = self._entries.get(abbr)
+            if current is not None and current['signature'] == signature:
+                continue
+
+            try:
+                self._entries[abbr] = self._load_entry(dir_entry.path, signature)
+            except (OSError, ValueError) as e:
+                print(f"ERROR loading state details {dir_entry.path}: {e}")
+                self._entries.pop(abbr, None)
+            changed = True
+
+        for abbr in set(self._entries) - seen:
+            del self._entries[abbr]
+            changed = True
+
+        if changed:
+            self._summaries = None
+
+    def get(self, abbr):
+        """Parsed state data for an abbreviation, or None"""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(abbr.upper())
+            return entry['data'] if entry else None
+
+    def summaries(self):
+        """One dict per state (abbr, name, completion, data), sorted by name"""
+        with self._lock:
+            self._refresh()
+            if self._summaries is None:
+                self._summaries = sorted((
+                    {
+                        'abbr': entry['data']['state_abbr'],
+                        'name': entry['data']['state'],
+                        'completion': entry['completion'],
+                        'file_path': entry['file_path'],
+                        'data': entry['data']
+                    }
+                    for entry in self._entries.values()
+                ), key=lambda x: x['name'])
+            return self._summaries
+
+    def save_state(self, abbr, state_data):
+        """Write a state's file (atomically) and update the index"""
+        abbr = abbr.upper()
+        file_path = os.path.join(self.directory, f'{abbr}.json')
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state_data, f, indent=2)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        stat = os.stat(file_path)
+        with self._lock:
+            self._entries[abbr] = {
+                'data': state_data,
+                'completion': calculate_state_completion(state_data),
+                'file_path': file_path,
+                'signature': (stat.st_mtime_ns, stat.st_size)
+            }
+            self._summaries = None
+
+    def reload(self):
+        """Re-scan the directory now, ignoring the check interval"""
+        with self._lock:
+            self._refresh(force=True)
+
+
+state_details = StateDetailsIndex()
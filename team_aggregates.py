@@ -0,0 +1,341 @@
+"""
+Team-wide aggregates for director views
+Reads the precomputed rs_team_rollups table (one row per holder per state)
+instead of re-aggregating every license on each page view
+
+The write helpers in db_write_functions.py call refresh_team_rollup() for
+each (holder, state) they touch, inside their own transaction.
+rebuild_team_rollups() recomputes the whole table.
+"""
+import hashlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, case, distinct
+from models import (
+    SessionLocal, RSLicenseHolder, RSLicense, RSLicenseCost,
+    RSLicenseBudget, RSTeamRollup
+)
+from db_read_functions import expiring_counts_by_holder
+
+EXPIRING_SOON_DAYS = 60  # Window for the "expiring" counters on team cards
+
+# Budget columns that make up the initial (non-recurring) estimate
+INITIAL_BUDGET_COLUMNS = (
+    RSLicenseBudget.application_fee,
+    RSLicenseBudget.test_fee,
+    RSLicenseBudget.trade_book_fee,
+    RSLicenseBudget.business_law_book_fee,
+    RSLicenseBudget.activation_fee,
+    RSLicenseBudget.prep_course_fee,
+    RSLicenseBudget.travel_estimate,
+    RSLicenseBudget.shipping_estimate
+)
+
+
+def _rollup_aggregates(db, holder_id=None, jurisdiction_abbr=None):
+    """
+    Compute rollup values from the base tables, keyed by (holder_id, abbr)
+
+    With no arguments this covers every holder and state; pass holder_id
+    (and optionally jurisdiction_abbr) to recompute just those groups.
+    """
+    def scoped(query):
+        if holder_id is not None:
+            query = query.filter(RSLicense.holder_id == holder_id)
+        if jurisdiction_abbr is not None:
+            query = query.filter(RSLicense.jurisdiction_abbr == jurisdiction_abbr)
+        return query.group_by(RSLicense.holder_id, RSLicense.jurisdiction_abbr)
+
+    key_columns = (RSLicense.holder_id, RSLicense.jurisdiction_abbr)
+    renewal_period = func.coalesce(RSLicense.renewal_period_years, 2)
+
+    license_rows = scoped(db.query(
+        *key_columns,
+        func.min(RSLicense.jurisdiction).label('jurisdiction'),
+        func.min(RSLicense.license_type).label('license_type'),
+        func.min(RSLicense.board_name).label('board_name'),
+        func.min(RSLicense.board_url).label('board_url'),
+        func.count(RSLicense.id).label('license_count'),
+        func.sum(case((RSLicense.status == 'licensed', 1), else_=0)).label('licensed_count'),
+        func.sum(case((RSLicense.status == 'in_progress', 1), else_=0)).label('in_progress_count'),
+        func.min(RSLicense.expires_on).label('earliest_expires_on'),
+        func.coalesce(func.sum(RSLicense.renewal_fee), 0).label('renewal_fees'),
+        # Same rule as the cost pages (calculate_license_totals and the
+        # recurring_cost / period sums in app.py): nothing for a 0-year period
+        func.coalesce(func.sum(
+            case((renewal_period > 0, RSLicense.renewal_fee / renewal_period), else_=0)
+        ), 0).label('annual_recurring_cost')
+    )).all()
+
+    estimated = dict(
+        ((row.holder_id, row.jurisdiction_abbr), row.total)
+        for row in scoped(db.query(
+            *key_columns,
+            func.sum(sum(func.coalesce(column, 0) for column in INITIAL_BUDGET_COLUMNS)).label('total')
+        ).join(RSLicenseBudget, RSLicenseBudget.license_id == RSLicense.id)).all()
+    )
+
+    spent = dict(
+        ((row.holder_id, row.jurisdiction_abbr), row.total)
+        for row in scoped(db.query(
+            *key_columns,
+            func.sum(RSLicenseCost.amount).label('total')
+        ).join(RSLicenseCost, RSLicenseCost.license_id == RSLicense.id)).all()
+    )
+
+    aggregates = {}
+    for row in license_rows:
+        key = (row.holder_id, row.jurisdiction_abbr)
+        licensed_count = int(row.licensed_count or 0)
+        in_progress_count = int(row.in_progress_count or 0)
+
+        if licensed_count:
+            status = 'licensed'
+        elif in_progress_count:
+            status = 'in_progress'
+        else:
+            status = 'not_licensed'
+
+        aggregates[key] = {
+            'jurisdiction': row.jurisdiction,
+            'license_type': row.license_type,
+            'board_name': row.board_name,
+            'board_url': row.board_url,
+            'status': status,
+            'license_count': int(row.license_count),
+            'licensed_count': licensed_count,
+            'in_progress_count': in_progress_count,
+            'earliest_expires_on': row.earliest_expires_on,
+            'renewal_fees': Decimal(str(row.renewal_fees or 0)),
+            'annual_recurring_cost': Decimal(str(row.annual_recurring_cost or 0)).quantize(Decimal('0.01')),
+            'estimated_total': Decimal(str(estimated.get(key) or 0)),
+            'actual_spent': Decimal(str(spent.get(key) or 0))
+        }
+
+    return aggregates
+
+
+def refresh_team_rollup(db, holder_id, jurisdiction_abbr=None):
+    """
+    Recompute the rollup rows for one holder (and optionally one state)
+
+    Runs inside the caller's session and transaction, so the rollup commits
+    (or rolls back) together with the write that made it stale. Rows whose
+    state no longer has any licenses are removed.
+    """
+    # Sessions don't autoflush; make pending license/cost changes visible
+    db.flush()
+
+    aggregates = _rollup_aggregates(db, holder_id, jurisdiction_abbr)
+
+    existing = db.query(RSTeamRollup).filter(RSTeamRollup.holder_id == holder_id)
+    if jurisdiction_abbr is not None:
+        existing = existing.filter(RSTeamRollup.jurisdiction_abbr == jurisdiction_abbr)
+
+    for rollup in existing.all():
+        key = (rollup.holder_id, rollup.jurisdiction_abbr)
+        if key not in aggregates:
+            db.delete(rollup)
+            continue
+        for field, value in aggregates.pop(key).items():
+            setattr(rollup, field, value)
+        rollup.refreshed_at = datetime.utcnow()
+
+    for (row_holder_id, abbr), values in aggregates.items():
+        db.add(RSTeamRollup(holder_id=row_holder_id, jurisdiction_abbr=abbr, **values))
+
+
+def rebuild_team_rollups():
+    """Recompute rs_team_rollups from scratch (after manual SQL edits or imports)"""
+    db = SessionLocal()
+    try:
+        db.query(RSTeamRollup).delete(synchronize_session=False)
+        aggregates = _rollup_aggregates(db)
+        for (holder_id, abbr), values in aggregates.items():
+            db.add(RSTeamRollup(holder_id=holder_id, jurisdiction_abbr=abbr, **values))
+        db.commit()
+        return len(aggregates)
+
+    except Exception as e:
+        db.rollback()
+        print(f"ERROR rebuilding team rollups: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def team_summary():
+    """
+    Company-wide totals in a single round trip
+
+    Returns total_holders, total_licenses (license rows), total_states
+    (distinct jurisdictions), holder_total_licenses / total_certificates
+    (sums of the holder counters), renewal_fees, annual_recurring_cost,
+    estimated_total and actual_spent.
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(
+            db.query(func.count(RSLicenseHolder.id)).scalar_subquery().label('total_holders'),
+            db.query(func.coalesce(func.sum(RSLicenseHolder.total_licenses), 0)).scalar_subquery().label('holder_total_licenses'),
+            db.query(func.coalesce(func.sum(RSLicenseHolder.total_certificates), 0)).scalar_subquery().label('total_certificates'),
+            db.query(func.coalesce(func.sum(RSTeamRollup.license_count), 0)).scalar_subquery().label('total_licenses'),
+            db.query(func.count(distinct(RSTeamRollup.jurisdiction_abbr))).scalar_subquery().label('total_states'),
+            db.query(func.coalesce(func.sum(RSTeamRollup.renewal_fees), 0)).scalar_subquery().label('renewal_fees'),
+            db.query(func.coalesce(func.sum(RSTeamRollup.annual_recurring_cost), 0)).scalar_subquery().label('annual_recurring_cost'),
+            db.query(func.coalesce(func.sum(RSTeamRollup.estimated_total), 0)).scalar_subquery().label('estimated_total'),
+            db.query(func.coalesce(func.sum(RSTeamRollup.actual_spent), 0)).scalar_subquery().label('actual_spent')
+        ).one()
+
+        return {
+            'total_holders': int(row.total_holders or 0),
+            'holder_total_licenses': int(row.holder_total_licenses or 0),
+            'total_certificates': int(row.total_certificates or 0),
+            'total_licenses': int(row.total_licenses or 0),
+            'total_states': int(row.total_states or 0),
+            'renewal_fees': float(row.renewal_fees or 0),
+            'annual_recurring_cost': float(row.annual_recurring_cost or 0),
+            'estimated_total': float(row.estimated_total or 0),
+            'actual_spent': float(row.actual_spent or 0)
+        }
+
+    finally:
+        db.close()
+
+
+def team_data_version():
+    """
+    Opaque version of the data behind the team views, for ETags
+
+    Changes whenever a license, holder or rollup row is added, removed or
+    updated (every license write refreshes a rollup), and at midnight since
+    days-remaining and expiring windows move with the date.
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(
+            db.query(func.count(RSLicenseHolder.id)).scalar_subquery(),
+            db.query(func.max(RSLicenseHolder.updated_at)).scalar_subquery(),
+            db.query(func.count(RSLicense.id)).scalar_subquery(),
+            db.query(func.max(RSLicense.updated_at)).scalar_subquery(),
+            db.query(func.count(RSTeamRollup.holder_id)).scalar_subquery(),
+            db.query(func.max(RSTeamRollup.refreshed_at)).scalar_subquery()
+        ).one()
+        return hashlib.sha256(repr((date.today().isoformat(), *row)).encode()).hexdigest()[:32]
+
+    finally:
+        db.close()
+
+
+def holder_rollup(expiring_within_days=EXPIRING_SOON_DAYS):
+    """
+    One row per license holder with license, state and expiring counts
+
+    expiring_count is the number of licenses expiring within the window,
+    overdue licenses included.
+    """
+    expiring = expiring_counts_by_holder(end=date.today() + timedelta(days=expiring_within_days))
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            RSLicenseHolder.employee_id,
+            RSLicenseHolder.pin,
+            RSLicenseHolder.full_name,
+            RSLicenseHolder.role,
+            RSLicenseHolder.status,
+            RSLicenseHolder.total_licenses,
+            RSLicenseHolder.total_certificates,
+            RSLicenseHolder.next_target_state,
+            func.coalesce(func.sum(RSTeamRollup.license_count), 0).label('license_count'),
+            func.count(RSTeamRollup.jurisdiction_abbr).label('states_count'),
+            func.coalesce(func.sum(RSTeamRollup.annual_recurring_cost), 0).label('annual_recurring_cost'),
+            func.coalesce(func.sum(RSTeamRollup.actual_spent), 0).label('actual_spent')
+        ).outerjoin(
+            RSTeamRollup, RSTeamRollup.holder_id == RSLicenseHolder.id
+        ).group_by(
+            RSLicenseHolder.id
+        ).order_by(
+            RSLicenseHolder.full_name
+        ).all()
+
+        return [{
+            'user_id': row.employee_id or row.pin,
+            'name': row.full_name,
+            'role': row.role or 'License Holder',
+            'pin': row.pin,
+            'account_status': row.status,
+            'total_licenses': row.total_licenses or 0,
+            'total_certificates': row.total_certificates or 0,
+            'next_target_state': row.next_target_state,
+            'license_count': int(row.license_count),
+            'states_count': int(row.states_count),
+            'expiring_count': expiring.get(row.employee_id or row.pin, 0),
+            'annual_recurring_cost': float(row.annual_recurring_cost),
+            'actual_spent': float(row.actual_spent)
+        } for row in rows]
+
+    finally:
+        db.close()
+
+
+def state_rollup():
+    """
+    Per-state coverage keyed by jurisdiction abbreviation
+
+    Each state carries its best status across holders, the earliest
+    expiration, and one entry per holder licensed (or applying) there.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            RSTeamRollup,
+            RSLicenseHolder.employee_id,
+            RSLicenseHolder.pin,
+            RSLicenseHolder.full_name
+        ).join(
+            RSLicenseHolder, RSTeamRollup.holder_id == RSLicenseHolder.id
+        ).order_by(
+            RSTeamRollup.jurisdiction_abbr,
+            RSLicenseHolder.full_name
+        ).all()
+
+        states = {}
+        for rollup, employee_id, pin, full_name in rows:
+            abbr = rollup.jurisdiction_abbr
+            expires_on = rollup.earliest_expires_on.isoformat() if rollup.earliest_expires_on else None
+
+            if abbr not in states:
+                states[abbr] = {
+                    'state_abbr': abbr,
+                    'name': rollup.jurisdiction,
+                    'status': 'not_licensed',
+                    'expires_on': None,
+                    'board_name': rollup.board_name,
+                    'board_url': rollup.board_url,
+                    'license_type': rollup.license_type,
+                    'license_count': 0,
+                    'annual_recurring_cost': 0,
+                    'holders': []
+                }
+
+            state = states[abbr]
+            if rollup.status == 'licensed' or (rollup.status == 'in_progress' and state['status'] != 'licensed'):
+                state['status'] = rollup.status
+            state['license_count'] += rollup.license_count
+            state['annual_recurring_cost'] += float(rollup.annual_recurring_cost or 0)
+            if expires_on and (not state['expires_on'] or expires_on < state['expires_on']):
+                state['expires_on'] = expires_on
+
+            state['holders'].append({
+                'name': full_name,
+                'user_id': employee_id or pin,
+                'status': rollup.status,
+                'expires_on': expires_on,
+                'license_count': rollup.license_count
+            })
+
+        return states
+
+    finally:
+        db.close()
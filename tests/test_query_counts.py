@@ -0,0 +1,112 @@
+"""
+Query-count regression tests for the holder loaders
+
+Needs a scratch PostgreSQL database with the schema applied (migrations/);
+set TEST_DATABASE_URL to run. Never point it at the shared production
+database: the tests create and delete their own rs_license_holders rows.
+
+    TEST_DATABASE_URL=postgresql://localhost/rs_test python -m pytest -q tests
+"""
+import os
+import sys
+import uuid
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL not set", allow_module_level=True)
+
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (  # noqa: E402
+    SessionLocal, RSLicenseHolder, RSLicense, RSLicenseCost, RSLicenseBudget, RSBioData
+)
+from db_read_functions import count_queries, load_license_holder_data  # noqa: E402
+
+
+def _create_holder(employee_id, license_count, costs_per_license):
+    db = SessionLocal()
+    try:
+        holder = RSLicenseHolder(employee_id=employee_id, full_name=f'Query Count {employee_id}', total_licenses=license_count)
+        holder.bio_data = RSBioData()
+        for i in range(license_count):
+            license = RSLicense(
+                license_id=f'{employee_id}-{i:03d}',
+                jurisdiction='Texas',
+                jurisdiction_abbr='TX',
+                jurisdiction_type='state',
+                license_type='Master Plumber',
+                status='licensed',
+                expires_on=date(2030, 1 + i % 12, 1),
+                renewal_fee=Decimal('100')
+            )
+            license.budget = RSLicenseBudget(application_fee=Decimal('50'), renewal_fee=Decimal('100'))
+            license.costs = [
+                RSLicenseCost(date=date(2024, 1 + c % 12, 1), category='test_fee', amount=Decimal('25'))
+                for c in range(costs_per_license)
+            ]
+            holder.licenses.append(license)
+        db.add(holder)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _delete_holder(employee_id):
+    db = SessionLocal()
+    try:
+        holder = db.query(RSLicenseHolder).filter(RSLicenseHolder.employee_id == employee_id).first()
+        if holder:
+            db.delete(holder)
+            db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def holders():
+    """A holder with one license and one cost, and one with many of each"""
+    prefix = f'qc-{uuid.uuid4().hex[:8]}'
+    small, large = f'{prefix}-small', f'{prefix}-large'
+    _create_holder(small, license_count=1, costs_per_license=1)
+    _create_holder(large, license_count=8, costs_per_license=5)
+    try:
+        yield small, large
+    finally:
+        _delete_holder(small)
+        _delete_holder(large)
+
+
+def _queries_to_load(employee_id, eager=True):
+    # First load resolves employee_id -> holder id; count the steady state
+    load_license_holder_data(employee_id, eager=eager, use_cache=False)
+    with count_queries() as counter:
+        holder = load_license_holder_data(employee_id, eager=eager, use_cache=False)
+    return holder, counter['count']
+
+
+def test_eager_load_query_count_does_not_grow_with_licenses_or_costs(holders):
+    small, large = holders
+
+    small_holder, small_count = _queries_to_load(small)
+    large_holder, large_count = _queries_to_load(large)
+
+    assert len(small_holder['licenses']) == 1
+    assert len(large_holder['licenses']) == 8
+    assert sum(len(lic['actual_costs']) for lic in large_holder['licenses']) == 40
+    assert large_count == small_count
+    assert large_count == 5  # holder, licenses, costs, budgets, bio
+
+
+def test_lazy_load_query_count_grows_with_licenses(holders):
+    """Guards the test itself: count_queries must see per-license queries"""
+    small, large = holders
+
+    _, small_count = _queries_to_load(small, eager=False)
+    _, large_count = _queries_to_load(large, eager=False)
+
+    assert large_count > small_count
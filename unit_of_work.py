@@ -0,0 +1,230 @@
+"""
+Unit of work for license holder writes
+Resolves the holder once (see holder_identity.py), each license once,
+applies any number of license/cost/budget changes and commits them in one
+transaction
+
+    with HolderUnitOfWork(account) as uow:
+        uow.update_license(license_id, license_data)
+        uow.update_estimated_costs(license_id, estimated_costs)
+
+On a clean exit the pending changes are flushed, holder license totals and
+team rollups are refreshed once for every state touched, the transaction is
+committed and the holder/report caches are invalidated. Any exception rolls
+everything back and propagates. The single-purpose helpers in
+db_write_functions.py are thin wrappers around this class.
+"""
+from datetime import datetime
+from decimal import Decimal
+from models import SessionLocal, RSLicense, RSLicenseCost, RSLicenseBudget
+from holder_cache import invalidate_holder
+from holder_identity import get_holder
+from report_cache import invalidate_cost_report
+from team_aggregates import refresh_team_rollup
+
+# Budget column -> key in an estimated_costs dict
+BUDGET_FIELDS = {
+    'application_fee': 'application_fee',
+    'test_fee': 'test_fee',
+    'trade_book_fee': 'trade_book_fee',
+    'business_law_book_fee': 'business_law_book_fee',
+    'activation_fee': 'activation_fee',
+    'prep_course_fee': 'prep_course_fee',
+    'travel_estimate': 'travel',
+    'shipping_estimate': 'shipping',
+    'renewal_fee': 'renewal_fee',
+    'continuing_ed_fee': 'continuing_ed_fee'
+}
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class HolderUnitOfWork:
+    """Batched writes to one license holder (account is employee_id or pin)"""
+
+    def __init__(self, account):
+        self.account = account
+        self.db = None
+        self.holder = None
+        self._licenses = {}  # license_id -> RSLicense, resolved at most once
+        self._touched_states = set()
+        self._license_count_changed = False
+
+    def __enter__(self):
+        self.db = SessionLocal()
+        self.holder = get_holder(self.db, self.account)
+
+        if not self.holder:
+            self.db.close()
+            raise LookupError("Holder not found")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._commit()
+            else:
+                self.db.rollback()
+        finally:
+            self.db.close()
+        return False
+
+    def _commit(self):
+        if self._license_count_changed:
+            self.db.flush()
+            self.holder.total_licenses = self.db.query(RSLicense).filter_by(holder_id=self.holder.id).count()
+
+        for abbr in self._touched_states:
+            refresh_team_rollup(self.db, self.holder.id, abbr)
+
+        self.db.commit()
+        invalidate_holder(self.account)
+        invalidate_cost_report(self.account)
+
+    def license(self, license_id):
+        """The holder's RSLicense with this license_id, or None"""
+        if license_id not in self._licenses:
+            self._licenses[license_id] = self.db.query(RSLicense).filter_by(
+                holder_id=self.holder.id,
+                license_id=license_id
+            ).first()
+        return self._licenses[license_id]
+
+    def _require_license(self, license_id):
+        license = self.license(license_id)
+        if not license:
+            raise LookupError(f"License {license_id} not found")
+        return license
+
+    def _set_budget(self, license, estimated_costs, only_provided=False):
+        budget = license.budget
+        if not budget:
+            budget = RSLicenseBudget(license_id=license.id)
+            license.budget = budget
+            self.db.add(budget)
+
+        for column, key in BUDGET_FIELDS.items():
+            if only_provided and estimated_costs.get(key) is None:
+                continue
+            setattr(budget, column, Decimal(str(estimated_costs.get(key, 0))))
+
+    def add_license(self, license_data):
+        """Create a license (and its budget, if estimated_costs are given)"""
+        recurring = license_data.get('recurring', {})
+        license = RSLicense(
+            holder_id=self.holder.id,
+            license_id=license_data['license_id'],
+            jurisdiction=license_data['jurisdiction'],
+            jurisdiction_abbr=license_data['jurisdiction_abbr'],
+            jurisdiction_type=license_data['jurisdiction_type'],
+            license_type=license_data['license_type'],
+            license_number=license_data.get('license_number'),
+            status=license_data.get('status', 'not_licensed'),
+            issued_on=_parse_date(license_data['issued_on']) if license_data.get('issued_on') else None,
+            expires_on=_parse_date(license_data['expires_on']) if license_data.get('expires_on') else None,
+            board_name=license_data.get('board_name'),
+            board_phone=license_data.get('board_phone'),
+            board_email=license_data.get('board_email'),
+            board_url=license_data.get('board_url'),
+            designated_role=license_data.get('designated_role'),
+            renewal_period_years=recurring.get('renewal_period_years', 2),
+            renewal_fee=Decimal(str(recurring.get('renewal_fee', 0)))
+        )
+        self.db.add(license)
+        self.db.flush()
+
+        if 'estimated_costs' in license_data:
+            self._set_budget(license, license_data['estimated_costs'])
+
+        self._licenses[license.license_id] = license
+        self._touched_states.add(license.jurisdiction_abbr)
+        self._license_count_changed = True
+        return license
+
+    def update_license(self, license_id, license_data):
+        """Update a license's fields (and budget, if estimated_costs are given)"""
+        license = self._require_license(license_id)
+        self._touched_states.add(license.jurisdiction_abbr)
+
+        license.jurisdiction = license_data.get('jurisdiction', license.jurisdiction)
+        license.jurisdiction_abbr = license_data.get('jurisdiction_abbr', license.jurisdiction_abbr)
+        license.jurisdiction_type = license_data.get('jurisdiction_type', license.jurisdiction_type)
+        license.license_type = license_data.get('license_type', license.license_type)
+        license.license_number = license_data.get('license_number')
+        license.status = license_data.get('status', license.status)
+
+        if license_data.get('issued_on'):
+            license.issued_on = _parse_date(license_data['issued_on'])
+        if license_data.get('expires_on'):
+            license.expires_on = _parse_date(license_data['expires_on'])
+
+        license.board_name = license_data.get('board_name')
+        license.board_phone = license_data.get('board_phone')
+        license.board_email = license_data.get('board_email')
+        license.board_url = license_data.get('board_url')
+        license.designated_role = license_data.get('designated_role')
+
+        if 'recurring' in license_data:
+            license.renewal_period_years = license_data['recurring'].get('renewal_period_years', 2)
+            license.renewal_fee = Decimal(str(license_data['recurring'].get('renewal_fee', 0)))
+
+        if 'estimated_costs' in license_data:
+            self._set_budget(license, license_data['estimated_costs'])
+
+        # The old state is already in _touched_states if the license moved
+        self._touched_states.add(license.jurisdiction_abbr)
+        return license
+
+    def delete_license(self, license_id):
+        """Delete a license (costs and budget cascade); False if it doesn't exist"""
+        license = self.license(license_id)
+        if not license:
+            return False
+
+        self.db.delete(license)
+        self._licenses[license_id] = None
+        self._touched_states.add(license.jurisdiction_abbr)
+        self._license_count_changed = True
+        return True
+
+    def add_cost(self, license_id, cost_data):
+        """Record an actual cost line against a license"""
+        license = self._require_license(license_id)
+        cost = RSLicenseCost(
+            license_id=license.id,
+            date=_parse_date(cost_data['date']) if cost_data.get('date') else datetime.now().date(),
+            category=cost_data['category'],
+            amount=Decimal(str(cost_data['amount'])),
+            vendor=cost_data.get('vendor'),
+            notes=cost_data.get('notes')
+        )
+        self.db.add(cost)
+        self._touched_states.add(license.jurisdiction_abbr)
+        return cost
+
+    def delete_cost(self, license_id, cost_index):
+        """Delete the cost_index-th cost line (by date); False if out of range"""
+        license = self._require_license(license_id)
+        self.db.flush()
+        costs = self.db.query(RSLicenseCost).filter_by(license_id=license.id).order_by(RSLicenseCost.date).all()
+
+        if not 0 <= cost_index < len(costs):
+            return False
+
+        self.db.delete(costs[cost_index])
+        self._touched_states.add(license.jurisdiction_abbr)
+        return True
+
+    def update_estimated_costs(self, license_id, estimated_costs, only_provided=False):
+        """
+        Set a license's budget from an estimated_costs dict
+
+        Missing keys are written as 0, unless only_provided is set, in which
+        case only the keys present (and not None) are changed.
+        """
+        license = self._require_license(license_id)
+        self._set_budget(license, estimated_costs, only_provided)
+        self._touched_states.add(license.jurisdiction_abbr)
+        return license